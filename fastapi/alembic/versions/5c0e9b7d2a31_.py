@@ -0,0 +1,160 @@
+"""create base tables
+
+Revision ID: 5c0e9b7d2a31
+Revises:
+Create Date: 2024-09-04 02:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '5c0e9b7d2a31'
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# 以降のリビジョンが前提とする、a1f963eda280 より前の時点のスキーマを作成する。
+# （events.type はあり、staff_attributes.hashed_password・staffs.schedule_version などは後続のリビジョンで追加する）
+# 起動時の create_all で作成済みのデータベースは、このリビジョンではなく `alembic stamp head` で現在のスキーマとして登録すること。
+
+
+def _timestamps():
+    return [
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('CURRENT_TIMESTAMP'), nullable=False),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('CURRENT_TIMESTAMP'), nullable=False),
+    ]
+
+
+def _create_table(name, *columns):
+    # 既にテーブルがある環境では作成しない（d9f3b6a2c8e1 と同じ扱い）
+    if sa.inspect(op.get_bind()).has_table(name):
+        return
+    op.create_table(name, *columns)
+    op.create_index(op.f(f'ix_{name}_id'), name, ['id'], unique=False)
+
+
+def upgrade() -> None:
+    _create_table('stores',
+    sa.Column('id', sa.BigInteger(), autoincrement=True, nullable=False),
+    sa.Column('name', sa.String(length=255), nullable=False),
+    sa.Column('name_ruby', sa.String(length=255), nullable=False),
+    sa.Column('postal_code', sa.String(length=10), nullable=False),
+    sa.Column('prefecture', sa.String(length=6), nullable=False),
+    sa.Column('street', sa.String(length=50), nullable=False),
+    sa.Column('address', sa.String(length=50), nullable=False),
+    sa.Column('building', sa.String(length=50), nullable=False),
+    sa.Column('phone_number', sa.String(length=11), nullable=False),
+    *_timestamps(),
+    sa.PrimaryKeyConstraint('id')
+    )
+    _create_table('roles',
+    sa.Column('id', sa.BigInteger(), autoincrement=True, nullable=False),
+    sa.Column('store_id', sa.BigInteger(), nullable=False),
+    sa.Column('name', sa.String(length=255), nullable=False),
+    *_timestamps(),
+    sa.ForeignKeyConstraint(['store_id'], ['stores.id']),
+    sa.PrimaryKeyConstraint('id')
+    )
+    _create_table('permissions',
+    sa.Column('id', sa.BigInteger(), autoincrement=True, nullable=False),
+    sa.Column('function', sa.Enum('general', 'settings', 'reports'), nullable=False),
+    sa.Column('description', sa.String(length=255), nullable=False),
+    *_timestamps(),
+    sa.PrimaryKeyConstraint('id')
+    )
+    _create_table('relations_of_role_and_permission',
+    sa.Column('id', sa.BigInteger(), autoincrement=True, nullable=False),
+    sa.Column('role_id', sa.BigInteger(), nullable=False),
+    sa.Column('permission_id', sa.BigInteger(), nullable=False),
+    *_timestamps(),
+    sa.ForeignKeyConstraint(['permission_id'], ['permissions.id']),
+    sa.ForeignKeyConstraint(['role_id'], ['roles.id']),
+    sa.PrimaryKeyConstraint('id')
+    )
+    _create_table('staffs',
+    sa.Column('id', sa.BigInteger(), autoincrement=True, nullable=False),
+    sa.Column('store_id', sa.BigInteger(), nullable=False),
+    sa.Column('role_id', sa.BigInteger(), nullable=False),
+    *_timestamps(),
+    sa.ForeignKeyConstraint(['role_id'], ['roles.id']),
+    sa.ForeignKeyConstraint(['store_id'], ['stores.id']),
+    sa.PrimaryKeyConstraint('id')
+    )
+    _create_table('staff_attributes',
+    sa.Column('id', sa.BigInteger(), autoincrement=True, nullable=False),
+    sa.Column('staff_id', sa.BigInteger(), nullable=False),
+    sa.Column('name', sa.String(length=255), nullable=False),
+    sa.Column('name_ruby', sa.String(length=255), nullable=False),
+    sa.Column('mail_address', sa.String(length=255), nullable=False),
+    *_timestamps(),
+    sa.ForeignKeyConstraint(['staff_id'], ['staffs.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    _create_table('customers',
+    sa.Column('id', sa.BigInteger(), autoincrement=True, nullable=False),
+    sa.Column('store_id', sa.BigInteger(), nullable=False),
+    *_timestamps(),
+    sa.ForeignKeyConstraint(['store_id'], ['stores.id']),
+    sa.PrimaryKeyConstraint('id')
+    )
+    _create_table('customer_attributes',
+    sa.Column('id', sa.BigInteger(), autoincrement=True, nullable=False),
+    sa.Column('customer_id', sa.BigInteger(), nullable=False),
+    sa.Column('name', sa.String(length=255), nullable=False),
+    sa.Column('name_ruby', sa.String(length=255), nullable=False),
+    sa.Column('mail_address', sa.String(length=255), nullable=False),
+    sa.Column('sex', sa.Enum('male', 'female', 'unknown'), nullable=False),
+    sa.Column('phone_number', sa.String(length=11), nullable=False),
+    sa.Column('postal_code', sa.String(length=10), nullable=False),
+    sa.Column('prefecture', sa.String(length=6), nullable=False),
+    sa.Column('street', sa.String(length=50), nullable=False),
+    sa.Column('address', sa.String(length=50), nullable=False),
+    sa.Column('building', sa.String(length=50), nullable=False),
+    *_timestamps(),
+    sa.ForeignKeyConstraint(['customer_id'], ['customers.id']),
+    sa.PrimaryKeyConstraint('id')
+    )
+    _create_table('events',
+    sa.Column('id', sa.BigInteger(), autoincrement=True, nullable=False),
+    sa.Column('store_id', sa.BigInteger(), nullable=False),
+    sa.Column('customer_id', sa.BigInteger(), nullable=False),
+    sa.Column('type', sa.Enum('booking', 'other'), nullable=False),
+    sa.Column('duration_by_minutes', sa.Integer(), nullable=True),
+    sa.Column('from_at', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('to_at', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('note', sa.Text(), nullable=True),
+    sa.Column('details', sa.JSON(), nullable=True),
+    sa.Column('status', sa.Enum('active', 'canceled'), nullable=False),
+    sa.Column('title', sa.String(length=255), nullable=False),
+    *_timestamps(),
+    sa.ForeignKeyConstraint(['customer_id'], ['customers.id']),
+    sa.ForeignKeyConstraint(['store_id'], ['stores.id']),
+    sa.PrimaryKeyConstraint('id')
+    )
+    _create_table('relations_of_event_and_staffs',
+    sa.Column('id', sa.BigInteger(), autoincrement=True, nullable=False),
+    sa.Column('event_id', sa.BigInteger(), nullable=False),
+    sa.Column('staff_id', sa.BigInteger(), nullable=False),
+    *_timestamps(),
+    sa.ForeignKeyConstraint(['event_id'], ['events.id']),
+    sa.ForeignKeyConstraint(['staff_id'], ['staffs.id']),
+    sa.PrimaryKeyConstraint('id')
+    )
+    _create_table('access_tokens',
+    sa.Column('id', sa.BigInteger(), autoincrement=True, nullable=False),
+    sa.Column('access_token', sa.String(length=255), nullable=False),
+    sa.Column('staff_secrets', sa.String(length=255), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('CURRENT_TIMESTAMP'), nullable=False),
+    sa.Column('expired_at', sa.DateTime(timezone=True), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+
+
+def downgrade() -> None:
+    for name in ['access_tokens', 'relations_of_event_and_staffs', 'events', 'customer_attributes', 'customers',
+                 'staff_attributes', 'staffs', 'relations_of_role_and_permission', 'permissions', 'roles', 'stores']:
+        op.drop_index(op.f(f'ix_{name}_id'), table_name=name)
+        op.drop_table(name)
@@ -1,7 +1,7 @@
 """
 
 Revision ID: a1f963eda280
-Revises: 
+Revises: 5c0e9b7d2a31
 Create Date: 2024-09-04 02:29:47.219117
 
 """
@@ -13,7 +13,7 @@ from sqlalchemy.dialects import mysql
 
 # revision identifiers, used by Alembic.
 revision: str = 'a1f963eda280'
-down_revision: Union[str, None] = None
+down_revision: Union[str, None] = '5c0e9b7d2a31'
 branch_labels: Union[str, Sequence[str], None] = None
 depends_on: Union[str, Sequence[str], None] = None
 
@@ -0,0 +1,26 @@
+"""add composite index on events(store_id, from_at)
+
+Revision ID: b3e5c8d1f2a4
+Revises: 91d9654d97fd
+Create Date: 2026-10-18 09:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b3e5c8d1f2a4'
+down_revision: Union[str, None] = '91d9654d97fd'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_events_store_id_from_at', 'events', ['store_id', 'from_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_events_store_id_from_at', table_name='events')
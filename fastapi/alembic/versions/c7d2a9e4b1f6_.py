@@ -0,0 +1,26 @@
+"""add schedule_version to staffs
+
+Revision ID: c7d2a9e4b1f6
+Revises: b3e5c8d1f2a4
+Create Date: 2026-10-18 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c7d2a9e4b1f6'
+down_revision: Union[str, None] = 'b3e5c8d1f2a4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('staffs', sa.Column('schedule_version', sa.BigInteger(), server_default='0', nullable=False))
+
+
+def downgrade() -> None:
+    op.drop_column('staffs', 'schedule_version')
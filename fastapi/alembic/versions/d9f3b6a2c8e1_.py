@@ -0,0 +1,48 @@
+"""add daily_booking_stats rollup table
+
+Revision ID: d9f3b6a2c8e1
+Revises: c7d2a9e4b1f6
+Create Date: 2026-10-18 11:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd9f3b6a2c8e1'
+down_revision: Union[str, None] = 'c7d2a9e4b1f6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # daily_booking_stats は create_all で作成済みの環境があるため、テーブルとインデックスは無い場合のみ作成する
+    inspector = sa.inspect(op.get_bind())
+    existing = set()
+    if inspector.has_table('daily_booking_stats'):
+        existing = {index['name'] for index in inspector.get_indexes('daily_booking_stats')}
+    else:
+        op.create_table('daily_booking_stats',
+        sa.Column('id', sa.BigInteger(), autoincrement=True, nullable=False),
+        sa.Column('store_id', sa.BigInteger(), nullable=False),
+        sa.Column('date', sa.Date(), nullable=False),
+        sa.Column('staff_id', sa.BigInteger(), nullable=False),
+        sa.Column('booking_count', sa.Integer(), nullable=False),
+        sa.Column('booked_minutes', sa.Integer(), nullable=False),
+        sa.Column('canceled_count', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+        sa.PrimaryKeyConstraint('id')
+        )
+        op.create_index(op.f('ix_daily_booking_stats_id'), 'daily_booking_stats', ['id'], unique=False)
+    if 'ux_daily_booking_stats_store_date_staff' not in existing:
+        op.create_index('ux_daily_booking_stats_store_date_staff', 'daily_booking_stats', ['store_id', 'date', 'staff_id'], unique=True)
+
+
+def downgrade() -> None:
+    op.drop_index('ux_daily_booking_stats_store_date_staff', table_name='daily_booking_stats')
+    op.drop_index(op.f('ix_daily_booking_stats_id'), table_name='daily_booking_stats')
+    op.drop_table('daily_booking_stats')
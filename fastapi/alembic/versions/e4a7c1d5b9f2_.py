@@ -0,0 +1,28 @@
+"""add change version counters to stores
+
+Revision ID: e4a7c1d5b9f2
+Revises: d9f3b6a2c8e1
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e4a7c1d5b9f2'
+down_revision: Union[str, None] = 'd9f3b6a2c8e1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('stores', sa.Column('bookings_version', sa.BigInteger(), server_default='0', nullable=False))
+    op.add_column('stores', sa.Column('customers_version', sa.BigInteger(), server_default='0', nullable=False))
+
+
+def downgrade() -> None:
+    op.drop_column('stores', 'customers_version')
+    op.drop_column('stores', 'bookings_version')
@@ -0,0 +1,33 @@
+"""track revoked tokens in access_tokens
+
+Revision ID: f2c6e8a4d1b7
+Revises: e4a7c1d5b9f2
+Create Date: 2026-10-18 13:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f2c6e8a4d1b7'
+down_revision: Union[str, None] = 'e4a7c1d5b9f2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # access_tokens のテーブルは 5c0e9b7d2a31（または create_all）で作成済みのため、このリビジョンではインデックスだけを追加する。
+    # create_all で作成した環境にはインデックスもあるため、無い場合のみ作成する
+    existing = {index['name'] for index in sa.inspect(op.get_bind()).get_indexes('access_tokens')}
+    if 'ux_access_tokens_access_token' not in existing:
+        op.create_index('ux_access_tokens_access_token', 'access_tokens', ['access_token'], unique=True)
+    if 'ix_access_tokens_expired_at' not in existing:
+        op.create_index('ix_access_tokens_expired_at', 'access_tokens', ['expired_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_access_tokens_expired_at', table_name='access_tokens')
+    op.drop_index('ux_access_tokens_access_token', table_name='access_tokens')
@@ -1,7 +1,9 @@
 # app/api/v1/auth.py
-from fastapi import APIRouter, Depends, Header, HTTPException
+from fastapi import APIRouter, Depends, Header, HTTPException, Request
 from fastapi.security import OAuth2PasswordBearer
 from ...schemas.auth import LoginSchema, PasswordResetRequestSchema, PasswordResetVerifySchema, PasswordResetSchema
+from ...core.config import settings
+from ...core.rate_limit import client_ip
 from ...services.auth_service import get_auth_service, AuthService
 
 router = APIRouter()
@@ -9,15 +11,13 @@ router = APIRouter()
 # トークン取得のための OAuth2PasswordBearer を設定
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login")
 
+# bcrypt の検証は専用のプールで実行されるため、ログイン処理は非同期で待つ
 @router.post("/auth/login")
-def login(data: LoginSchema, service: AuthService = Depends(get_auth_service)):
-    return service.login(data)
+async def login(data: LoginSchema, request: Request, service: AuthService = Depends(get_auth_service)):
+    return await service.login(data, client_ip=client_ip(request, settings.TRUSTED_PROXY_HOPS))
 
 @router.post("/auth/logout")
 def logout(authorization: str = Header(...), service: AuthService = Depends(get_auth_service)):
-    # Authorization ヘッダーの内容をログに出力
-    print(f"Authorization header: {authorization}")
-
     if "Bearer" not in authorization:
         raise HTTPException(status_code=400, detail="Invalid Authorization header format")
 
@@ -29,9 +29,9 @@ def password_reset_request(data: PasswordResetRequestSchema, service: AuthServic
     return service.request_password_reset(data)
 
 @router.post("/auth/password/verify")
-def password_reset_verify(data: PasswordResetVerifySchema, service: AuthService = Depends(get_auth_service)):
-    return service.verify_password_reset(data)
+async def password_reset_verify(data: PasswordResetVerifySchema, service: AuthService = Depends(get_auth_service)):
+    return await service.verify_password_reset(data)
 
 @router.put("/auth/password/reset")
-def password_reset(data: PasswordResetSchema, service: AuthService = Depends(get_auth_service)):
-    return service.reset_password(data)
\ No newline at end of file
+async def password_reset(data: PasswordResetSchema, service: AuthService = Depends(get_auth_service)):
+    return await service.reset_password(data)
\ No newline at end of file
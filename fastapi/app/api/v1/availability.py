@@ -0,0 +1,20 @@
+# app/api/v1/availability.py
+from fastapi import APIRouter, Depends, Query
+from typing import List, Optional
+from datetime import datetime
+from app.schemas.availability import StaffAvailabilitySchema
+from app.services.availability_service import AvailabilityService, get_availability_service
+
+router = APIRouter()
+
+# 指定期間内で、duration（分）の予約を入れられる空き枠をスタッフごとに返す
+@router.get("/stores/{store_id}/availability", response_model=List[StaffAvailabilitySchema])
+def get_availability(
+    store_id: int,
+    from_at: datetime = Query(..., alias="from"),
+    to_at: datetime = Query(..., alias="to"),
+    duration: int = Query(..., description="予約の長さ（分）"),
+    staff_id: Optional[int] = None,
+    service: AvailabilityService = Depends(get_availability_service)
+):
+    return service.get_availability(store_id, from_at, to_at, duration, staff_id=staff_id)
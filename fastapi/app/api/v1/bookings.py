@@ -1,53 +1,107 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from ...schemas.event import EventCreateSchema, EventUpdateSchema, EventResponseSchema
-from ...services.event_service import EventService, get_event_service
-from ...db.database import get_db
-from typing import List
+import asyncio
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from ...schemas.event import EventCreateSchema, EventUpdateSchema, EventResponseSchema, EventStatusEnum, EventBulkResultSchema
+from ...services.event_service import AsyncEventService, get_async_event_service
+from ...core.config import settings
+from ...core.pagination import decode_cursor, split_page, set_next_cursor
+from ...core.conditional import conditional_get
+from ...core.responses import validated_response
+from ...services.booking_events import booking_events
+from typing import List, Optional
+from datetime import datetime
 
 router = APIRouter()
 
 # 1. 店舗IDに紐づいた予約（イベント）のリストを取得するエンドポイント。
-@router.get("/stores/{store_id}/bookings", response_model=List[EventResponseSchema])
-def get_bookings(store_id: int, db: Session = Depends(get_db), service: EventService = Depends(get_event_service)):
-    # イベントサービスを使って、指定された店舗IDに対応する全てのイベントを取得
-    events = service.get_events(store_id)
-    # 取得したイベントのリストを、PydanticモデルであるEventResponseSchemaのリストに変換して返す
-    return [EventResponseSchema.from_orm(event) for event in events]
+#    from / to を指定すると、その期間に開始する予約のみを返す（カレンダーの日・週表示用）。
+#    limit を指定するとページングされ、次ページのカーソルを X-Next-Cursor ヘッダーで返す。
+#    ETag / Last-Modified に対応し、変更が無ければ 304 を返す。
+@router.get("/stores/{store_id}/bookings", response_model=List[EventResponseSchema],
+            dependencies=[Depends(conditional_get("bookings"))])
+async def get_bookings(
+    store_id: int,
+    response: Response,
+    from_at: Optional[datetime] = Query(None, alias="from"),
+    to_at: Optional[datetime] = Query(None, alias="to"),
+    staff_id: Optional[int] = None,
+    status: Optional[EventStatusEnum] = None,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=settings.PAGINATION_MAX_LIMIT),
+    service: AsyncEventService = Depends(get_async_event_service)
+):
+    if from_at and to_at and from_at >= to_at:
+        raise HTTPException(status_code=400, detail="'from' must be earlier than 'to'")
+    # イベントサービスを使って、指定された条件に一致するイベントをDB側で絞り込んで取得
+    events = await service.get_events(
+        store_id, from_at=from_at, to_at=to_at, staff_id=staff_id, status=status,
+        cursor=decode_cursor(cursor, (datetime, int)) if cursor else None, limit=limit
+    )
+    events, next_cursor = split_page(events, limit, lambda event: (event.from_at, event.id))
+    set_next_cursor(response, next_cursor)
+    # 取得したイベントのリストを、PydanticモデルであるEventResponseSchemaのリストに変換して返す。
+    # 検証は from_orm の1回だけにし、response_model による再検証を行わずに orjson でシリアライズする
+    return validated_response([EventResponseSchema.from_orm(event) for event in events], response)
 
 # 2. 新しい予約（イベント）を作成するエンドポイント。
 @router.post("/stores/{store_id}/bookings", response_model=EventResponseSchema)
-def create_booking(store_id: int, data: EventCreateSchema, db: Session = Depends(get_db), service: EventService = Depends(get_event_service)):
+async def create_booking(store_id: int, data: EventCreateSchema, service: AsyncEventService = Depends(get_async_event_service)):
     # Event を作成
-    new_event = service.create_event(store_id, data)
-    return EventResponseSchema.from_orm(new_event)
+    return await service.create_event(store_id, data)
+
+# 2-1. 複数の予約（イベント）をまとめて作成するエンドポイント（予約帳の移行用）。
+#      重複などで作成できなかった項目は、項目ごとの結果として返す。
+@router.post("/stores/{store_id}/bookings/bulk", response_model=List[EventBulkResultSchema])
+async def create_bookings_bulk(store_id: int, data: List[EventCreateSchema], service: AsyncEventService = Depends(get_async_event_service)):
+    return await service.create_events_bulk(store_id, data)
+
+# 2-2. 予約の作成・更新・削除を Server-Sent Events で配信するエンドポイント。
+#      /stores/{store_id}/bookings/{booking_id} より先に登録する必要がある。
+@router.get("/stores/{store_id}/bookings/stream")
+async def stream_bookings(store_id: int, request: Request):
+    async def event_stream():
+        async with booking_events.subscribe(store_id) as queue:
+            yield "retry: 3000\n\n"
+            while not await request.is_disconnected():
+                try:
+                    data = await asyncio.wait_for(queue.get(), timeout=settings.BOOKING_STREAM_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    # プロキシに接続を切られないよう、定期的にコメント行を送る
+                    yield ": keepalive\n\n"
+                    continue
+                yield f"event: booking\ndata: {data}\n\n"
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 # 3. 指定された予約（イベント）を取得するエンドポイント。
-@router.get("/stores/{store_id}/bookings/{booking_id}", response_model=EventResponseSchema)
-def get_booking(store_id: int, booking_id: int, db: Session = Depends(get_db), service: EventService = Depends(get_event_service)):
+@router.get("/stores/{store_id}/bookings/{booking_id}", response_model=EventResponseSchema,
+            dependencies=[Depends(conditional_get("bookings"))])
+async def get_booking(store_id: int, booking_id: int, service: AsyncEventService = Depends(get_async_event_service)):
     # イベントサービスを使って、指定された店舗IDと予約IDに対応するイベントを取得
-    event = service.get_event(store_id, booking_id)
+    event = await service.get_event(store_id, booking_id)
     # 取得したイベントをPydanticモデルのEventResponseSchemaに変換して返す
     return EventResponseSchema.from_orm(event)
 
 # 4. 指定された予約（イベント）を更新するエンドポイント。
 @router.put("/stores/{store_id}/bookings/{booking_id}", response_model=EventResponseSchema)
-def update_booking(store_id: int, booking_id: int, data: EventUpdateSchema, db: Session = Depends(get_db), service: EventService = Depends(get_event_service)):
+async def update_booking(store_id: int, booking_id: int, data: EventUpdateSchema, service: AsyncEventService = Depends(get_async_event_service)):
     # イベントサービスを使って、指定された店舗IDと予約IDに基づいてイベントを更新
-    event = service.update_event(store_id, booking_id, data)
-    # 更新したイベントをPydanticモデルのEventResponseSchemaに変換して返す
-    return EventResponseSchema.from_orm(event)
+    return await service.update_event(store_id, booking_id, data)
 
 # 5. 指定された予約（イベント）を削除するエンドポイント。
 @router.delete("/stores/{store_id}/bookings/{booking_id}", response_model=EventResponseSchema)
-def delete_booking(store_id: int, booking_id: int, db: Session = Depends(get_db), service: EventService = Depends(get_event_service)):
+async def delete_booking(store_id: int, booking_id: int, service: AsyncEventService = Depends(get_async_event_service)):
     # 削除する前にイベントを取得
-    event = service.get_event(store_id, booking_id)
+    event = await service.get_event(store_id, booking_id)
     if not event:
         raise HTTPException(status_code=404, detail="Event not found")
 
     # イベントを削除
-    service.delete_event(store_id, booking_id)
+    await service.delete_event(store_id, booking_id)
 
     # 削除されたイベントをレスポンスとして返す
     return EventResponseSchema.from_orm(event)
\ No newline at end of file
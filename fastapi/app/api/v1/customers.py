@@ -1,44 +1,56 @@
 # api/v1/customers.py
-from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
-from typing import List
-from app.db.database import get_db
+from fastapi import APIRouter, Depends, Query, Response
+from typing import List, Optional
+from app.core.config import settings
+from app.core.pagination import decode_cursor, split_page, set_next_cursor
+from app.core.conditional import conditional_get
+from app.core.responses import validated_response
 from app.schemas.customer import CustomerCreateSchema, CustomerUpdateSchema, CustomerResponseSchema
-from app.services.customer_service import CustomerService
+from app.services.customer_service import AsyncCustomerService, get_async_customer_service, customer_attributes_as_dicts
 
 router = APIRouter()
 
-def get_customer_service(db: Session = Depends(get_db)):
-    return CustomerService(db)
-
-@router.get("/stores/{store_id}/customers", response_model=List[CustomerResponseSchema])
-def get_customers(store_id: int, service: CustomerService = Depends(get_customer_service)):
-    return service.get_customers(store_id)
+@router.get("/stores/{store_id}/customers", response_model=List[CustomerResponseSchema],
+            dependencies=[Depends(conditional_get("customers"))])
+async def get_customers(
+    store_id: int,
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=settings.PAGINATION_MAX_LIMIT),
+    service: AsyncCustomerService = Depends(get_async_customer_service)
+):
+    # limit を指定するとページングされ、次ページのカーソルを X-Next-Cursor ヘッダーで返す
+    after_id = decode_cursor(cursor, (int,))[0] if cursor else None
+    customers = await service.get_customers(store_id, after_id=after_id, limit=limit)
+    customers, next_cursor = split_page(customers, limit, lambda customer: (customer.id,))
+    set_next_cursor(response, next_cursor)
+    # 検証は from_orm の1回だけにし、response_model による再検証を行わずに orjson でシリアライズする
+    return validated_response([CustomerResponseSchema.from_orm(customer) for customer in customers], response)
 
 @router.post("/stores/{store_id}/customers")
-def create_customer(store_id: int, data: CustomerCreateSchema, db: Session = Depends(get_db), service: CustomerService = Depends(get_customer_service)):
+async def create_customer(store_id: int, data: CustomerCreateSchema, service: AsyncCustomerService = Depends(get_async_customer_service)):
     # カスタマーとその属性を作成する
-    new_customer = service.create_customer(store_id, data)
+    customer = await service.create_customer(store_id, data)
 
     # CustomerAttributesを取得して、それをCustomerResponseSchemaに渡す
-    customer, customer_attributes = service.get_customer_with_attributes(new_customer.id)
     response = CustomerResponseSchema(
         id=customer.id,
         store_id=customer.store_id,
-        customer_attributes=customer_attributes,  # 一つのCustomerに対して1つのCustomerAttributesがある前提
+        customer_attributes=customer_attributes_as_dicts(customer),  # 一つのCustomerに対して1つのCustomerAttributesがある前提
         created_at=customer.created_at,  # created_at を追加
         updated_at=customer.updated_at   # updated_at を追加
     )
     return response
 
-@router.get("/stores/{store_id}/customers/{customer_id}", response_model=CustomerResponseSchema)
-def get_customer(store_id: int, customer_id: int, service: CustomerService = Depends(get_customer_service)):
-    return service.get_customer(store_id, customer_id)
+@router.get("/stores/{store_id}/customers/{customer_id}", response_model=CustomerResponseSchema,
+            dependencies=[Depends(conditional_get("customers"))])
+async def get_customer(store_id: int, customer_id: int, service: AsyncCustomerService = Depends(get_async_customer_service)):
+    return await service.get_customer(store_id, customer_id)
 
 @router.put("/stores/{store_id}/customers/{customer_id}")
-def update_customer(store_id: int, customer_id: int, data: CustomerUpdateSchema, service: CustomerService = Depends(get_customer_service)):
-    return service.update_customer(store_id, customer_id, data)
+async def update_customer(store_id: int, customer_id: int, data: CustomerUpdateSchema, service: AsyncCustomerService = Depends(get_async_customer_service)):
+    return await service.update_customer(store_id, customer_id, data)
 
 @router.delete("/stores/{store_id}/customers/{customer_id}")
-def delete_customer(store_id: int, customer_id: int, service: CustomerService = Depends(get_customer_service)):
-    return service.delete_customer(store_id, customer_id)
\ No newline at end of file
+async def delete_customer(store_id: int, customer_id: int, service: AsyncCustomerService = Depends(get_async_customer_service)):
+    return await service.delete_customer(store_id, customer_id)
@@ -0,0 +1,26 @@
+# app/api/v1/export.py
+from fastapi import APIRouter
+from fastapi.responses import StreamingResponse
+from app.services.export_service import ExportService
+
+router = APIRouter()
+
+# 店舗の予約（イベント）をCSVまたはNDJSONでストリーミング出力するエンドポイント。
+@router.get("/stores/{store_id}/export/bookings")
+def export_bookings(store_id: int, format: str = "csv"):
+    service = ExportService(format)
+    return StreamingResponse(
+        service.export_bookings(store_id),
+        media_type=service.media_type,
+        headers={"Content-Disposition": f'attachment; filename="store_{store_id}_bookings.{format}"'},
+    )
+
+# 店舗の顧客と顧客属性をCSVまたはNDJSONでストリーミング出力するエンドポイント。
+@router.get("/stores/{store_id}/export/customers")
+def export_customers(store_id: int, format: str = "csv"):
+    service = ExportService(format)
+    return StreamingResponse(
+        service.export_customers(store_id),
+        media_type=service.media_type,
+        headers={"Content-Disposition": f'attachment; filename="store_{store_id}_customers.{format}"'},
+    )
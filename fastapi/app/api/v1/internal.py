@@ -0,0 +1,31 @@
+# app/api/v1/internal.py
+import hmac
+from typing import Optional
+from fastapi import APIRouter, Depends, Header, HTTPException
+from app.core.config import settings
+from app.db.database import engine, async_engine, replica_engines
+from app.db.pool import pool_status
+
+
+def require_internal_secret(x_internal_secret: Optional[str] = Header(None)):
+    # PROFILING_SECRET を X-Internal-Secret ヘッダーで指定したリクエストだけを通す。
+    # 未設定または一致しない場合は、エンドポイントの存在も知らせないよう 404 を返す
+    # （X-Profile ヘッダーを使うとプロファイラが本文を置き換えてしまうため、ヘッダーは分けている）
+    if (
+        not settings.PROFILING_SECRET
+        or x_internal_secret is None
+        or not hmac.compare_digest(x_internal_secret.encode(), settings.PROFILING_SECRET.encode())
+    ):
+        raise HTTPException(status_code=404, detail="Not Found")
+
+
+router = APIRouter(dependencies=[Depends(require_internal_secret)], include_in_schema=False)
+
+# 運用向け: DB接続プールの使用状況（使用中・待機中・オーバーフロー）とチェックアウトの待ち時間を返す
+@router.get("/internal/db-pool")
+def get_db_pool_status():
+    return {
+        "sync": pool_status(engine),
+        "async": pool_status(async_engine.sync_engine),
+        "replicas": [pool_status(replica.sync_engine) for replica in replica_engines],
+    }
@@ -0,0 +1,11 @@
+# app/api/v1/metrics.py
+from fastapi import APIRouter, Response
+from app.core.metrics import render_metrics
+
+router = APIRouter()
+
+# 運用向け: Prometheus 形式のメトリクス（リクエスト数・処理時間・DB接続プール・認証キャッシュ）
+@router.get("/metrics", include_in_schema=False)
+def get_metrics():
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
@@ -1,11 +1,12 @@
 # app/api/v1/staff.py
-from fastapi import APIRouter, Depends, HTTPException, Header
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Header, Query, Response
+from typing import Optional
 from app.schemas.staff import StaffCreateSchema, StaffUpdateSchema, StaffResponseSchema, StaffAttributeResponseSchema
-from app.services.staff_service import get_staff_service, StaffService
-from app.db.database import get_db
+from app.services.staff_service import get_async_staff_service, AsyncStaffService
 from app.services.auth_service import get_auth_service, AuthService
 from app.models.staff import Staff
+from app.core.config import settings
+from app.core.pagination import decode_cursor, split_page, set_next_cursor
 
 router = APIRouter()
 
@@ -27,22 +28,33 @@ def get_my_account(store_id: int, token: str = Header(...), auth_service: AuthSe
     return staff_attributes
 
 @router.put("/stores/{store_id}/me")
-def update_my_account(store_id: int, data: StaffUpdateSchema, service: StaffService = Depends(get_staff_service)):
-    return service.update_my_account(store_id, data)
+async def update_my_account(store_id: int, data: StaffUpdateSchema, service: AsyncStaffService = Depends(get_async_staff_service)):
+    return await service.update_my_account(store_id, data)
 
 @router.get("/stores/{store_id}/staffs")
-def get_staffs(store_id: int, service: StaffService = Depends(get_staff_service)):
-    return service.get_staffs(store_id)
+async def get_staffs(
+    store_id: int,
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=settings.PAGINATION_MAX_LIMIT),
+    service: AsyncStaffService = Depends(get_async_staff_service)
+):
+    # limit を指定するとページングされ、次ページのカーソルを X-Next-Cursor ヘッダーで返す
+    after_id = decode_cursor(cursor, (int,))[0] if cursor else None
+    staffs = await service.get_staffs(store_id, after_id=after_id, limit=limit)
+    staffs, next_cursor = split_page(staffs, limit, lambda staff: (staff.id,))
+    set_next_cursor(response, next_cursor)
+    return staffs
 
 @router.post("/stores/{store_id}/staffs")
-def create_staff(data: StaffCreateSchema, db: Session = Depends(get_db), service: StaffService = Depends(get_staff_service)):
-    role = service.get_role(data.role_id)
+async def create_staff(data: StaffCreateSchema, service: AsyncStaffService = Depends(get_async_staff_service)):
+    role = await service.get_role(data.role_id)
     if not role:
         raise HTTPException(status_code=404, detail="Role not found")
 
     store_id = role.store_id
 
-    new_staff = service.create_staff(store_id, data)
+    new_staff = await service.create_staff(store_id, data)
 
     # 複数のstaff_attributesがある場合、最初の要素にアクセスします
     if new_staff.staff_attributes:
@@ -61,13 +73,13 @@ def create_staff(data: StaffCreateSchema, db: Session = Depends(get_db), service
     return response
 
 @router.get("/stores/{store_id}/staffs/{staff_id}")
-def get_staff(store_id: int, staff_id: int, service: StaffService = Depends(get_staff_service)):
-    return service.get_staff(store_id, staff_id)
+async def get_staff(store_id: int, staff_id: int, service: AsyncStaffService = Depends(get_async_staff_service)):
+    return await service.get_staff(store_id, staff_id)
 
 @router.put("/stores/{store_id}/staffs/{staff_id}")
-def update_staff(store_id: int, staff_id: int, data: StaffUpdateSchema, service: StaffService = Depends(get_staff_service)):
-    return service.update_staff(store_id, staff_id, data)
+async def update_staff(store_id: int, staff_id: int, data: StaffUpdateSchema, service: AsyncStaffService = Depends(get_async_staff_service)):
+    return await service.update_staff(store_id, staff_id, data)
 
 @router.delete("/stores/{store_id}/staffs/{staff_id}")
-def delete_staff(store_id: int, staff_id: int, service: StaffService = Depends(get_staff_service)):
-    return service.delete_staff(store_id, staff_id)
\ No newline at end of file
+async def delete_staff(store_id: int, staff_id: int, service: AsyncStaffService = Depends(get_async_staff_service)):
+    return await service.delete_staff(store_id, staff_id)
\ No newline at end of file
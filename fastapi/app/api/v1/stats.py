@@ -0,0 +1,18 @@
+# app/api/v1/stats.py
+from fastapi import APIRouter, Depends, Query
+from typing import List
+from datetime import date
+from app.schemas.stats import DailyBookingStatSchema
+from app.services.stats_service import StatsService, get_stats_service
+
+router = APIRouter()
+
+# 日別・スタッフ別の予約数、予約時間（分）、キャンセル数を返す（ダッシュボード用）
+@router.get("/stores/{store_id}/stats/daily", response_model=List[DailyBookingStatSchema])
+def get_daily_stats(
+    store_id: int,
+    from_date: date = Query(..., alias="from"),
+    to_date: date = Query(..., alias="to"),
+    service: StatsService = Depends(get_stats_service)
+):
+    return service.get_daily_stats(store_id, from_date, to_date)
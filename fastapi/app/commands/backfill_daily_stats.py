@@ -0,0 +1,23 @@
+# app/commands/backfill_daily_stats.py
+# 日次予約集計（daily_booking_stats）を events から作り直すコマンド。
+#   python -m app.commands.backfill_daily_stats [--store-id STORE_ID]
+import argparse
+from app.db.database import SessionLocal
+from app.services.stats_service import StatsService
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild daily_booking_stats from events")
+    parser.add_argument("--store-id", type=int, default=None, help="対象の店舗ID（省略時は全店舗）")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        rows = StatsService(db).backfill(store_id=args.store_id)
+        print(f"Rebuilt {rows} daily_booking_stats rows")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
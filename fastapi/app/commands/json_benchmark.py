@@ -0,0 +1,80 @@
+# app/commands/json_benchmark.py
+# 予約一覧のレスポンスを作る処理の1件あたりのコストを、従来の経路と orjson の経路で比較するコマンド。DBは使いません。
+#   python -m app.commands.json_benchmark [--sizes 1000 10000] [--repeat 5]
+import argparse
+import asyncio
+import time
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from typing import List
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+from app.core.responses import FastJSONResponse
+from app.schemas.event import EventResponseSchema
+
+
+def make_events(count: int) -> List[SimpleNamespace]:
+    # ORM の Event と同じ属性を持つオブジェクト。スタッフは2人ずつ担当する
+    staffs = [
+        SimpleNamespace(
+            id=i, role_id=1, store_id=1,
+            staff_attributes=[SimpleNamespace(name=f"staff{i}", name_ruby="すたっふ", mail_address=f"staff{i}@example.com")],
+        )
+        for i in range(10)
+    ]
+    start = datetime(2026, 10, 1, 9)
+    return [
+        SimpleNamespace(
+            id=i, store_id=1, customer_id=i % 500, duration_by_minutes=60,
+            from_at=start + timedelta(minutes=30 * i), to_at=start + timedelta(minutes=30 * i + 60),
+            note="メモ", title="カット", details={"overview": "初回"}, status="active",
+            created_at=start, updated_at=start, staffs=[staffs[i % 10], staffs[(i + 1) % 10]],
+        )
+        for i in range(count)
+    ]
+
+
+def best_of(repeat: int, func) -> float:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare per-item JSON response cost for booking lists")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000], help="予約の件数")
+    parser.add_argument("--repeat", type=int, default=5, help="計測の回数（最小値を使う）")
+    args = parser.parse_args()
+
+    field = create_response_field(name="response", type_=List[EventResponseSchema])
+    loop = asyncio.new_event_loop()
+
+    for size in args.sizes:
+        events = make_events(size)
+        schemas = [EventResponseSchema.from_orm(event) for event in events]
+
+        def legacy():
+            # FastAPI の既定の経路: response_model での再検証 -> jsonable_encoder -> json.dumps
+            content = loop.run_until_complete(serialize_response(field=field, response_content=schemas, is_coroutine=True))
+            JSONResponse(content)
+
+        def fast():
+            FastJSONResponse(schemas)
+
+        from_orm = best_of(args.repeat, lambda: [EventResponseSchema.from_orm(event) for event in events])
+        legacy_time = best_of(args.repeat, legacy)
+        fast_time = best_of(args.repeat, fast)
+        print(f"{size} bookings (per item)")
+        print(f"  from_orm (both paths):                  {from_orm / size * 1e6:8.1f}us")
+        print(f"  revalidate + jsonable_encoder + json:   {legacy_time / size * 1e6:8.1f}us")
+        print(f"  orjson (FastJSONResponse):              {fast_time / size * 1e6:8.1f}us  ({legacy_time / fast_time:.1f}x)")
+
+    loop.close()
+
+
+if __name__ == "__main__":
+    main()
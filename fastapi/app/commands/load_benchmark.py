@@ -0,0 +1,147 @@
+# app/commands/load_benchmark.py
+# 顧客一覧の取得を、同期（スレッドプール + 同期エンジン）と非同期（イベントループ + 非同期エンジン）の経路で
+# 同時接続数を上げて比較するコマンド。DATABASE_URL のデータベースを読み取ります（書き込みはしません）。
+#   python -m app.commands.load_benchmark [--store-id 1] [--concurrency 500] [--requests 2000]
+# 両方の経路を1つのアプリで提供し、接続プールの設定（db.database.POOL_OPTIONS）も共通にして、経路の違いだけを比べます。
+import argparse
+import asyncio
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from typing import List, Optional
+from fastapi import Depends, FastAPI
+from sqlalchemy.orm import Session, selectinload
+from app.core.responses import FastJSONResponse, validated_response
+from app.db.database import POOL_OPTIONS, get_db
+from app.models.customer import Customer
+from app.schemas.customer import CustomerResponseSchema
+from app.services.customer_service import AsyncCustomerService, get_async_customer_service
+
+# 認証などのミドルウェアは通さず、DBアクセスとシリアライズの経路だけを計測する
+bench_app = FastAPI(default_response_class=FastJSONResponse)
+
+
+@bench_app.get("/sync/stores/{store_id}/customers")
+def get_customers_sync(store_id: int, limit: Optional[int] = None, db: Session = Depends(get_db)):
+    # AsyncCustomerService.get_customers と同じクエリを同期のセッションで実行する
+    query = db.query(Customer).options(selectinload(Customer.customer_attributes))\
+        .filter(Customer.store_id == store_id).order_by(Customer.id)
+    if limit is not None:
+        query = query.limit(limit + 1)
+    customers = query.all()[:limit]
+    return validated_response([CustomerResponseSchema.from_orm(customer) for customer in customers])
+
+
+@bench_app.get("/async/stores/{store_id}/customers")
+async def get_customers_async(store_id: int, limit: Optional[int] = None,
+                              service: AsyncCustomerService = Depends(get_async_customer_service)):
+    customers = (await service.get_customers(store_id, limit=limit))[:limit]
+    return validated_response([CustomerResponseSchema.from_orm(customer) for customer in customers])
+
+
+async def fetch(reader: asyncio.StreamReader, writer: asyncio.StreamWriter, path: str) -> int:
+    # HTTP/1.1 の keep-alive で1リクエストを送り、ステータスを返す（計測にHTTPクライアントの依存を持ち込まない）
+    writer.write(f"GET {path} HTTP/1.1\r\nHost: localhost\r\n\r\n".encode())
+    await writer.drain()
+    head = await reader.readuntil(b"\r\n\r\n")
+    lines = head.decode("latin-1").split("\r\n")
+    length = 0
+    for line in lines[1:]:
+        name, _, value = line.partition(":")
+        if name.lower() == "content-length":
+            length = int(value)
+    await reader.readexactly(length)
+    return int(lines[0].split()[1])
+
+
+async def run_load(port: int, path: str, concurrency: int, total: int, timeout: float) -> dict:
+    remaining = total
+    latencies: List[float] = []
+    errors = 0
+
+    async def client():
+        nonlocal remaining, errors
+        connection = None
+        while remaining > 0:
+            remaining -= 1
+            started = time.perf_counter()
+            try:
+                if connection is None:
+                    connection = await asyncio.wait_for(asyncio.open_connection("127.0.0.1", port), timeout)
+                status = await asyncio.wait_for(fetch(*connection, path), timeout)
+            except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, ValueError):
+                errors += 1
+                if connection is not None:
+                    connection[1].close()
+                connection = None
+                continue
+            if status == 200:
+                latencies.append(time.perf_counter() - started)
+            else:
+                errors += 1
+        if connection is not None:
+            connection[1].close()
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "ok": len(latencies),
+        "errors": errors,
+        "elapsed": elapsed,
+        "p50": statistics.median(latencies) if latencies else 0.0,
+        "p99": latencies[int(len(latencies) * 0.99) - 1] if latencies else 0.0,
+    }
+
+
+def wait_for_port(port: int, server: subprocess.Popen, timeout: float = 30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError("benchmark server exited during startup")
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError("benchmark server did not start")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare sync and async request paths under concurrent load")
+    parser.add_argument("--store-id", type=int, default=1, help="顧客一覧を取得する店舗")
+    parser.add_argument("--limit", type=int, default=20, help="1リクエストで取得する顧客の件数")
+    parser.add_argument("--concurrency", type=int, default=500, help="同時接続数")
+    parser.add_argument("--requests", type=int, default=2000, help="経路ごとのリクエスト数")
+    parser.add_argument("--timeout", type=float, default=60, help="1リクエストのタイムアウト（秒）")
+    parser.add_argument("--paths", nargs="+", choices=["sync", "async"], default=["sync", "async"])
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    print(f"pool: {POOL_OPTIONS} (same engine options for both paths)")
+    print(f"GET /stores/{args.store_id}/customers?limit={args.limit}, "
+          f"{args.concurrency} connections, {args.requests} requests per path")
+    for name in args.paths:
+        # 経路ごとにサーバーを起動し直し、前の計測で残った接続やスレッドの影響を受けないようにする
+        server = subprocess.Popen([
+            sys.executable, "-m", "uvicorn", "app.commands.load_benchmark:bench_app",
+            "--port", str(args.port), "--log-level", "warning", "--no-access-log",
+            "--backlog", str(max(2048, args.concurrency)),
+        ])
+        try:
+            wait_for_port(args.port, server)
+            path = f"/{name}/stores/{args.store_id}/customers?limit={args.limit}"
+            result = asyncio.run(run_load(args.port, path, args.concurrency, args.requests, args.timeout))
+        finally:
+            server.terminate()
+            server.wait()
+        print(f"  {name:5}  ok {result['ok']:6}  errors {result['errors']:6}  "
+              f"{result['ok'] / result['elapsed']:8.1f} req/s  "
+              f"p50 {result['p50'] * 1000:8.1f}ms  p99 {result['p99'] * 1000:8.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
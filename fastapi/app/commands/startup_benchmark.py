@@ -0,0 +1,81 @@
+# app/commands/startup_benchmark.py
+# ワーカーのコールドスタート（import・起動処理・最初のリクエスト）にかかる時間を計測するコマンド。
+#   python -m app.commands.startup_benchmark [--runs 5] [--path /] [--budget-ms 1000]
+# 計測ごとに新しいインタプリタを起動するため、モジュールのキャッシュの影響を受けません。
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+
+# 子プロセスで実行するコード。HTTPクライアントの import が計測に含まれないよう、ASGI を直接呼び出す
+CHILD = """
+import asyncio, json, sys, time
+started = time.perf_counter()
+from app.main import app
+imported = time.perf_counter()
+
+async def request(path):
+    messages = []
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+    async def send(message):
+        messages.append(message)
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+        "scheme": "http", "path": path, "raw_path": path.encode(), "query_string": b"",
+        "root_path": "", "headers": [(b"host", b"localhost")],
+        "client": ("127.0.0.1", 0), "server": ("localhost", 80),
+    }
+    await app(scope, receive, send)
+    return messages[0]["status"]
+
+async def main():
+    await app.router.startup()
+    ready = time.perf_counter()
+    status = await request(sys.argv[1])
+    first = time.perf_counter()
+    await request(sys.argv[1])
+    second = time.perf_counter()
+    await app.router.shutdown()
+    print(json.dumps({
+        "status": status,
+        "import": imported - started,
+        "startup": ready - imported,
+        "first_request": first - ready,
+        "second_request": second - first,
+        "total": first - started,
+    }))
+
+asyncio.run(main())
+"""
+
+PHASES = ("import", "startup", "first_request", "second_request", "total")
+
+
+def measure(path: str) -> dict:
+    output = subprocess.run([sys.executable, "-c", CHILD, path], check=True, capture_output=True, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure worker cold start latency")
+    parser.add_argument("--runs", type=int, default=5, help="計測の回数")
+    parser.add_argument("--path", default="/", help="最初のリクエストで呼び出すGETのパス")
+    parser.add_argument("--budget-ms", type=float, default=1000, help="total の中央値の上限（ミリ秒）。超えた場合は終了コード1")
+    args = parser.parse_args()
+
+    results = [measure(args.path) for _ in range(args.runs)]
+    print(f"GET {args.path} -> {results[-1]['status']} ({args.runs} runs)")
+    for phase in PHASES:
+        values = [result[phase] * 1000 for result in results]
+        print(f"{phase:>15}: median {statistics.median(values):8.1f}ms  max {max(values):8.1f}ms")
+
+    total = statistics.median(result["total"] * 1000 for result in results)
+    if total > args.budget_ms:
+        print(f"Cold start {total:.1f}ms exceeds the budget of {args.budget_ms:.0f}ms")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
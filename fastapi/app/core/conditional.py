@@ -0,0 +1,56 @@
+# app/core/conditional.py
+import hashlib
+from email.utils import format_datetime, parsedate_to_datetime
+from datetime import timezone
+from fastapi import Depends, HTTPException, Request, Response, status
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db.database import get_async_db
+from app.services.store_service import AsyncStoreService
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    # 弱い比較（W/ の有無を無視）で If-None-Match と照合する
+    if if_none_match.strip() == "*":
+        return True
+    target = etag.removeprefix("W/")
+    return any(tag.strip().removeprefix("W/") == target for tag in if_none_match.split(","))
+
+
+def conditional_get(resource: str):
+    """
+    店舗単位の変更バージョンから ETag / Last-Modified を付与し、
+    クライアントのキャッシュが最新であれば本文を作らずに 304 Not Modified を返す依存関係を作ります。
+    判定にかかるのは stores の主キー検索1回だけです。
+    """
+    async def dependency(store_id: int, request: Request, response: Response, db: AsyncSession = Depends(get_async_db)):
+        current = await AsyncStoreService(db).get_change_version(store_id, resource)
+        if current is None:
+            # 店舗が無い場合の応答はエンドポイント側に任せる
+            return
+        version, updated_at = current
+        # 一覧はクエリ（期間・ページなど）ごとに内容が異なるため、パスとクエリもタグに含める
+        variant = hashlib.blake2b(f"{request.url.path}?{request.url.query}".encode(), digest_size=6).hexdigest()
+        etag = f'W/"{resource}-{store_id}-{version}-{variant}"'
+        last_modified = updated_at if updated_at.tzinfo else updated_at.replace(tzinfo=timezone.utc)
+        headers = {
+            "ETag": etag,
+            "Last-Modified": format_datetime(last_modified, usegmt=True),
+            "Cache-Control": "no-cache",
+        }
+
+        if_none_match = request.headers.get("if-none-match")
+        if_modified_since = request.headers.get("if-modified-since")
+        not_modified = False
+        if if_none_match is not None:
+            # If-None-Match がある場合は If-Modified-Since より優先する
+            not_modified = _etag_matches(if_none_match, etag)
+        elif if_modified_since is not None:
+            try:
+                not_modified = last_modified.replace(microsecond=0) <= parsedate_to_datetime(if_modified_since)
+            except (TypeError, ValueError):
+                not_modified = False
+
+        if not_modified:
+            raise HTTPException(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+        response.headers.update(headers)
+    return dependency
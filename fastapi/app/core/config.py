@@ -1,17 +1,86 @@
-from pydantic import BaseSettings
-from typing import List
+from pydantic import BaseSettings, conint
+from typing import List, Optional
 
 class Settings(BaseSettings):
     PROJECT_NAME: str = "MyFaN"
     PROJECT_VERSION: str = "1.0.0"
     API_V1_STR: str = "/api/v1"
     DATABASE_URL: str
+    # DB接続プールの設定（同期・非同期のエンジンそれぞれに適用）
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 20
+    DB_POOL_TIMEOUT: int = 30
+    DB_POOL_RECYCLE: int = 1800
+    DB_POOL_PRE_PING: bool = True
+    # SQLの件数または合計時間がしきい値を超えたリクエストを、SQLとともにログに出力する
+    SLOW_REQUEST_QUERY_COUNT: int = 50
+    SLOW_REQUEST_DB_MS: float = 500
+    # SQLの文字列をリクエストごとに記録する割合（0〜1）。件数と時間は常に集計する
+    SQL_CAPTURE_SAMPLE_RATE: float = 0.1
+    # リードレプリカの接続先（JSON配列）。書き込み後 READ_YOUR_WRITES_SECONDS 秒は同じクライアントの読み取りもプライマリに向ける
+    DATABASE_REPLICA_URLS: List[str] = []
+    READ_YOUR_WRITES_SECONDS: int = 5
+    # 非同期ドライバの接続先。省略時は DATABASE_URL から導出する（mysql -> mysql+aiomysql）
+    ASYNC_DATABASE_URL: Optional[str] = None
     SUPABASE_URL: str
     SUPABASE_KEY: str
     SUPABASE_JWT_SECRET: str
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
+    # bcrypt のコスト（変更すると既存のハッシュはログイン時に再ハッシュされる）と、ハッシュ化専用スレッド数
+    BCRYPT_ROUNDS: int = 12
+    PASSWORD_HASH_WORKERS: int = 4
+    # ロールごとの権限ビットマスクをキャッシュする秒数。他のワーカーでのロール変更が反映されるまでの上限になるため、
+    # 権限の剥奪が長く残らないよう10秒以下に制限する
+    PERMISSION_MATRIX_TTL_SECONDS: conint(ge=1, le=10) = 5
+    # ログアウトで失効したトークンの管理。ワーカー間の同期間隔と、期限切れの掃除間隔（秒）
+    TOKEN_REVOCATION_SYNC_SECONDS: int = 5
+    TOKEN_REVOCATION_SWEEP_SECONDS: int = 600
+    TOKEN_REVOCATION_BLOOM_CAPACITY: int = 100000
+    TOKEN_REVOCATION_BLOOM_ERROR_RATE: float = 0.001
+    # 同期のたびに読み直す、取り込み済みの最大IDより前のIDの件数（コミットが採番順より遅れた失効を取りこぼさないため）
+    TOKEN_REVOCATION_SYNC_OVERLAP_IDS: int = 1000
+    # 認証済みスタッフ（Principal）のキャッシュ。TTL は他のワーカーでのスタッフの削除やロール変更が反映されるまでの上限になるため、
+    # 10秒以下に制限する
+    PRINCIPAL_CACHE_MAXSIZE: int = 10000
+    PRINCIPAL_CACHE_TTL_SECONDS: conint(ge=1, le=10) = 5
+    # Supabase の公開鍵の有効期間と、期限の何秒前からバックグラウンドで更新するか
+    SUPABASE_KEYS_TTL_SECONDS: int = 3600
+    SUPABASE_KEYS_REFRESH_BEFORE_SECONDS: int = 300
+    # ログイン試行の制限（window 秒あたりの回数）。複数ワーカーで共有する場合は backend を "sqlite" にする
+    LOGIN_RATE_LIMIT_BACKEND: str = "memory"
+    LOGIN_RATE_LIMIT_SQLITE_PATH: str = "/tmp/login_rate_limit.sqlite3"
+    LOGIN_RATE_LIMIT_WINDOW_SECONDS: int = 60
+    LOGIN_ATTEMPTS_PER_EMAIL: int = 5
+    LOGIN_ATTEMPTS_PER_IP: int = 20
+    # アプリの前段にあるリバースプロキシの数。1以上のとき、接続元IPは X-Forwarded-For の右からこの数番目の値を使う。
+    # 0 のときは接続元のアドレスを使うため、プロキシの背後では必ず設定すること（全クライアントが1つのIPのバケットを共有してしまう）
+    TRUSTED_PROXY_HOPS: int = 0
+    # 検証済みJWTのクレームをキャッシュする最大件数
+    TOKEN_CACHE_MAXSIZE: int = 10000
+    # 予約の重複チェック用インデックスの設定
+    BOOKING_LOCK_STRIPES: int = 64
+    SCHEDULE_INDEX_MAX_BUCKETS: int = 10000
+    # 予約ストリーム（SSE）のキープアライブ間隔（秒）
+    BOOKING_STREAM_KEEPALIVE_SECONDS: int = 15
+    # 一括予約作成で受け付ける最大件数
+    BULK_BOOKING_MAX_ITEMS: int = 5000
+    # 一覧APIの1ページあたりの最大件数
+    PAGINATION_MAX_LIMIT: int = 1000
+    # 空き枠検索の設定
+    AVAILABILITY_SLOT_MINUTES: int = 15
+    AVAILABILITY_MAX_DAYS: int = 31
     ALLOWED_ORIGINS: List[str] = ["http://localhost:3000", "https://example.com"]  # フロントエンドのURLを指定
+    # /metrics: gunicorn などで複数ワーカーを動かす場合は、ワーカー間で共有するディレクトリを指定する（起動前に空にしておく）
+    PROMETHEUS_MULTIPROC_DIR: Optional[str] = None
+    # DB接続プールと認証キャッシュの状態をメトリクスに書き出す間隔（秒）
+    METRICS_PUBLISH_SECONDS: int = 5
+    # X-Profile ヘッダーにこの値を指定したリクエストをプロファイルする。未設定の場合はプロファイラを登録しない
+    # /internal/db-pool も X-Internal-Secret ヘッダーにこの値を指定した場合だけ応答する（未設定の場合は常に 404）
+    PROFILING_SECRET: Optional[str] = None
+    PROFILE_SAMPLE_INTERVAL_MS: float = 1
+    # プロファイル結果（collapsed 形式）の保存先。未設定の場合はレスポンスの本文として返す
+    PROFILE_OUTPUT_DIR: Optional[str] = None
 
     class Config:
         env_file = ".env"
@@ -0,0 +1,132 @@
+# app/core/jwks.py
+import asyncio
+import logging
+import time
+from typing import TYPE_CHECKING, Any, Dict, Optional
+
+if TYPE_CHECKING:
+    import httpx
+
+logger = logging.getLogger(__name__)
+
+
+class KeyFetchError(Exception):
+    """
+    公開鍵の取得に失敗したことを表します（通信エラー、エラーのステータス、不正な形式の本文のいずれか）。
+    """
+
+
+class SupabaseKeyProvider:
+    """
+    Supabase の公開鍵（JWKS）を kid ごとに保持します。
+
+    - 接続プールを持つ1つの httpx.AsyncClient を使い回します。
+    - 取得は single-flight で、同時に鍵を必要とした呼び出しは同じ取得処理を待ちます。
+    - 有効期限の refresh_before 秒前からは、古い鍵を返しつつバックグラウンドで再取得するため、
+      鍵のローテーションや期限切れでリクエストが待たされることはありません。
+    - 未知の kid による再取得は min_refresh_interval 秒に1回までに制限します。
+    - 取得に失敗した場合（5xx や不正な形式の本文を含む）は、min_refresh_interval 秒たつまで再取得しません。
+    - httpx は最初に鍵を取得するときに読み込みます。JWTシークレット（HS256）だけを使う環境では読み込まれません。
+    """
+    def __init__(self, base_url: str, api_key: str, fallback_secret: Optional[str] = None,
+                 ttl: float = 3600, refresh_before: float = 300, min_refresh_interval: float = 30,
+                 timeout: float = 5.0, transport: Optional["httpx.AsyncBaseTransport"] = None):
+        self.base_url = base_url
+        self.api_key = api_key
+        self.fallback_secret = fallback_secret
+        self.ttl = ttl
+        self.refresh_before = refresh_before
+        self.min_refresh_interval = min_refresh_interval
+        self.timeout = timeout
+        # テストではローカルのスタブサーバーや MockTransport を指定できる
+        self._transport = transport
+        self._client: Optional["httpx.AsyncClient"] = None
+        self._keys: Dict[Optional[str], Any] = {}
+        self._default_key: Any = None
+        self._expires_at = 0.0
+        self._fetched_at = 0.0
+        # 取得に失敗したとき、次に再取得してよい時刻
+        self._retry_at = 0.0
+        self._refreshing: Optional[asyncio.Task] = None
+
+    def _get_client(self) -> "httpx.AsyncClient":
+        if self._client is None:
+            import httpx
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                headers={"apikey": self.api_key, "Authorization": f"Bearer {self.api_key}"},
+                timeout=self.timeout,
+                limits=httpx.Limits(max_connections=10, max_keepalive_connections=2),
+                transport=self._transport,
+            )
+        return self._client
+
+    async def _fetch(self):
+        import httpx
+        # 失敗した場合も含め、未知の kid による再取得の間隔は最後の試行から数える
+        self._fetched_at = time.monotonic()
+        try:
+            response = await self._get_client().get("/auth/v1/jwt/keys")
+            if response.status_code == 404:
+                # 公開鍵が取得できない場合、プロジェクト設定のJWTシークレットを使用
+                keys, default_key = {}, self.fallback_secret
+            else:
+                response.raise_for_status()
+                body = response.json()
+                # 標準の JWKS 形式（{"keys": [...]}）と、publicKey を持つ配列の両方を受け付ける
+                entries = body["keys"] if isinstance(body, dict) else body
+                keys = {entry.get("kid"): entry.get("publicKey", entry) for entry in entries}
+                default_key = next(iter(keys.values()), None)
+        except (httpx.HTTPError, KeyError, TypeError, ValueError, AttributeError) as e:
+            # どの失敗でも、しばらくは再取得しない（手元の鍵があれば、その間は期限切れの鍵で検証を続ける）
+            self._retry_at = time.monotonic() + self.min_refresh_interval
+            raise KeyFetchError(f"{type(e).__name__}: {e}") from e
+        now = time.monotonic()
+        self._keys, self._default_key = keys, default_key
+        self._expires_at = now + self.ttl
+
+    def _refresh(self) -> asyncio.Task:
+        # 実行中の取得があればそれを共有する
+        if self._refreshing is None or self._refreshing.done():
+            self._refreshing = asyncio.ensure_future(self._fetch())
+            self._refreshing.add_done_callback(self._log_failure)
+        return self._refreshing
+
+    @staticmethod
+    def _log_failure(task: asyncio.Task):
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"Failed to refresh Supabase keys: {task.exception()}")
+
+    async def get_key(self, kid: Optional[str] = None):
+        now = time.monotonic()
+        if now < self._retry_at:
+            # 取得に失敗した直後は、手元の鍵（無ければ None）で応答する
+            pass
+        elif now >= self._expires_at:
+            # 鍵を持っていない、または期限切れの場合のみ取得を待つ
+            try:
+                await asyncio.shield(self._refresh())
+            except KeyFetchError:
+                # 取得できなくても、期限切れの鍵があればそれで検証を続ける
+                if self._default_key is None:
+                    raise
+        elif now >= self._expires_at - self.refresh_before:
+            # 期限が近い場合は手元の鍵を返し、裏で再取得する
+            self._refresh()
+
+        if kid is None:
+            return self._default_key
+        if kid not in self._keys and time.monotonic() - self._fetched_at >= self.min_refresh_interval:
+            # ローテーションで追加された鍵の可能性があるため、一度だけ再取得する
+            try:
+                await asyncio.shield(self._refresh())
+            except KeyFetchError:
+                return None
+        return self._keys.get(kid)
+
+    async def aclose(self):
+        if self._refreshing is not None and not self._refreshing.done():
+            self._refreshing.cancel()
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
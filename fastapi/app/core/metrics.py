@@ -0,0 +1,141 @@
+# app/core/metrics.py
+import asyncio
+import logging
+import os
+import threading
+from typing import Dict, Tuple
+from app.core.config import settings
+
+# prometheus_client は import 時に PROMETHEUS_MULTIPROC_DIR を見て、値をワーカーごとのファイルに書くかを決める
+if settings.PROMETHEUS_MULTIPROC_DIR:
+    os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", settings.PROMETHEUS_MULTIPROC_DIR)
+
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram, generate_latest, multiprocess, REGISTRY
+from app.core.security import get_token_cache_stats
+from app.db.database import async_engine, engine, replica_engines
+from app.services.principal_cache import principal_cache
+
+logger = logging.getLogger(__name__)
+
+MULTIPROCESS = "PROMETHEUS_MULTIPROC_DIR" in os.environ
+
+# ルートに一致しなかったリクエストのラベル。生のパスを使うとラベルの種類が際限なく増えるため
+UNMATCHED_ROUTE = "<unmatched>"
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+REQUESTS = Counter("http_requests_total", "HTTP requests", ["method", "route", "status"])
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds", "HTTP request latency", ["method", "route"], buckets=LATENCY_BUCKETS
+)
+IN_PROGRESS = Gauge("http_requests_in_progress", "HTTP requests being processed", multiprocess_mode="livesum")
+
+DB_POOL_SIZE = Gauge("db_pool_size", "Configured pool size", ["engine"], multiprocess_mode="livesum")
+DB_POOL_CHECKED_OUT = Gauge("db_pool_checked_out", "Connections in use", ["engine"], multiprocess_mode="livesum")
+DB_POOL_IDLE = Gauge("db_pool_idle", "Idle connections in the pool", ["engine"], multiprocess_mode="livesum")
+DB_POOL_OVERFLOW = Gauge("db_pool_overflow", "Connections opened beyond the pool size", ["engine"], multiprocess_mode="livesum")
+DB_POOL_CHECKOUTS = Counter("db_pool_checkouts_total", "Connection checkouts", ["engine"])
+DB_POOL_CHECKOUT_TIMEOUTS = Counter("db_pool_checkout_timeouts_total", "Checkouts that timed out", ["engine"])
+DB_POOL_CHECKOUT_WAIT = Counter("db_pool_checkout_wait_seconds_total", "Time spent waiting for a connection", ["engine"])
+
+AUTH_CACHE_HITS = Counter("auth_cache_hits_total", "Authentication cache hits", ["cache"])
+AUTH_CACHE_MISSES = Counter("auth_cache_misses_total", "Authentication cache misses", ["cache"])
+AUTH_CACHE_SIZE = Gauge("auth_cache_entries", "Entries in the authentication cache", ["cache"], multiprocess_mode="livesum")
+
+# ラベル付きの子メトリクスをキャッシュし、リクエストごとの labels() の探索とロックを省く
+_request_counters: Dict[Tuple[str, str, str], Counter] = {}
+_latency_histograms: Dict[Tuple[str, str], Histogram] = {}
+
+
+def record_request(method: str, route: str, status: int, elapsed: float):
+    """
+    1件のリクエストを記録します。値はワーカーごとに保持し、ワーカー間の集計は /metrics の読み出し時に行います。
+    """
+    key = (method, route, str(status))
+    counter = _request_counters.get(key)
+    if counter is None:
+        counter = _request_counters[key] = REQUESTS.labels(*key)
+    counter.inc()
+    histogram = _latency_histograms.get(key[:2])
+    if histogram is None:
+        histogram = _latency_histograms[key[:2]] = REQUEST_LATENCY.labels(method, route)
+    histogram.observe(elapsed)
+
+
+def _engines():
+    yield "sync", engine
+    yield "async", async_engine.sync_engine
+    for index, replica in enumerate(replica_engines):
+        yield f"replica-{index}", replica.sync_engine
+
+
+# 前回書き出した累計値。カウンタには差分だけを加算する
+_published: Dict[Tuple[Counter, str], float] = {}
+# バックグラウンドのタスク（イベントループ）と /metrics（スレッドプール）の両方から書き出すため、差分の計算と更新をまとめて保護する
+_published_lock = threading.Lock()
+
+
+def _add_delta(counter: Counter, label: str, total: float):
+    key = (counter, label)
+    with _published_lock:
+        delta = total - _published.get(key, 0)
+        # 累計値は増える一方なので、先に新しい値を書き出した呼び出しがあれば、古い値では戻さない
+        if delta > 0:
+            counter.labels(label).inc(delta)
+            _published[key] = total
+
+
+def publish_process_metrics():
+    """
+    このワーカーのDB接続プールと認証キャッシュの状態をメトリクスに書き出します。
+    """
+    for label, db_engine in _engines():
+        pool = db_engine.pool
+        if hasattr(pool, "checkedout"):
+            DB_POOL_SIZE.labels(label).set(pool.size())
+            DB_POOL_CHECKED_OUT.labels(label).set(pool.checkedout())
+            DB_POOL_IDLE.labels(label).set(pool.checkedin())
+            # 負の値は、プールの上限まで接続がまだ作られていないことを表す
+            DB_POOL_OVERFLOW.labels(label).set(max(pool.overflow(), 0))
+        stats = getattr(pool, "stats", None)
+        if stats is not None:
+            _add_delta(DB_POOL_CHECKOUTS, label, stats.checkouts)
+            _add_delta(DB_POOL_CHECKOUT_TIMEOUTS, label, stats.timeouts)
+            _add_delta(DB_POOL_CHECKOUT_WAIT, label, stats.wait_total)
+
+    for label, stats in (("token", get_token_cache_stats()), ("principal", principal_cache.stats())):
+        _add_delta(AUTH_CACHE_HITS, label, stats["hits"])
+        _add_delta(AUTH_CACHE_MISSES, label, stats["misses"])
+        AUTH_CACHE_SIZE.labels(label).set(stats["size"])
+
+
+async def run():
+    """
+    プールとキャッシュの状態を定期的に書き出します。/metrics を受けたワーカー以外の状態も集計に含めるため、
+    アプリケーションの起動時に各ワーカーでタスクとして開始します。
+    """
+    while True:
+        try:
+            publish_process_metrics()
+        except Exception as e:
+            logger.error(f"Error while publishing metrics: {str(e)}")
+        await asyncio.sleep(settings.METRICS_PUBLISH_SECONDS)
+
+
+def render_metrics() -> Tuple[bytes, str]:
+    """
+    Prometheus のテキスト形式でメトリクスを返します。マルチプロセスモードでは全ワーカーの値を集計します。
+    """
+    publish_process_metrics()
+    if MULTIPROCESS:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+
+def mark_process_dead():
+    # 終了したワーカーの live* ゲージを集計から外す
+    if MULTIPROCESS:
+        multiprocess.mark_process_dead(os.getpid())
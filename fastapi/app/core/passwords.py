@@ -0,0 +1,41 @@
+# app/core/passwords.py
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Tuple
+from passlib.context import CryptContext
+from app.core.config import settings
+
+# bcrypt のコストは設定で変更できる。min/max を同じ値にしておくことで、
+# コストが異なる既存のハッシュは verify_and_update() で新しいコストに再ハッシュされる
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=settings.BCRYPT_ROUNDS,
+    bcrypt__min_rounds=settings.BCRYPT_ROUNDS,
+    bcrypt__max_rounds=settings.BCRYPT_ROUNDS,
+)
+
+
+class PasswordHasher:
+    """
+    bcrypt によるハッシュ化・検証を専用のスレッドプールで実行します。
+    bcrypt は計算中に GIL を解放するため、リクエストを処理するスレッドプールやイベントループを塞ぎません。
+    同時に実行される bcrypt の数は max_workers で上限を設けます。
+    """
+    def __init__(self, max_workers: int):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="password-hasher")
+
+    async def hash(self, password: str) -> str:
+        return await asyncio.get_running_loop().run_in_executor(self._executor, pwd_context.hash, password)
+
+    async def verify_and_update(self, password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+        """
+        パスワードを検証し、コストが変わっていれば新しいハッシュも返します。
+        """
+        return await asyncio.get_running_loop().run_in_executor(
+            self._executor, pwd_context.verify_and_update, password, hashed_password
+        )
+
+
+# プロセス全体で共有するハッシュ化用プール
+password_hasher = PasswordHasher(max_workers=settings.PASSWORD_HASH_WORKERS)
@@ -0,0 +1,115 @@
+# app/core/profiling.py
+import asyncio
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from typing import List, Optional
+
+# アプリケーションのソースのディレクトリ。スレッドプールのスタックのうち、アプリのコードを含むものだけを記録する
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_SOURCE_ROOT = os.path.dirname(APP_DIR)
+
+
+def _label(frame) -> str:
+    code = frame.f_code
+    filename = code.co_filename
+    if "site-packages" + os.sep in filename:
+        filename = filename.split("site-packages" + os.sep, 1)[1]
+    elif filename.startswith(_SOURCE_ROOT):
+        filename = os.path.relpath(filename, _SOURCE_ROOT)
+    return f"{getattr(code, 'co_qualname', code.co_name)} ({filename}:{code.co_firstlineno})"
+
+
+def _thread_stack(frame, stop=None) -> List:
+    # 末端から呼び出し元へたどり、stop のフレームがあればそこで打ち切る（stop を含む）
+    frames = []
+    while frame is not None:
+        frames.append(frame)
+        if frame is stop:
+            return frames[::-1]
+        frame = frame.f_back
+    return [] if stop is not None else frames[::-1]
+
+
+def _await_stack(task: asyncio.Task, root=None) -> List:
+    # 中断中のコルーチンは、スレッドのスタックに現れないため await の連鎖をたどる（root より外側は捨てる）
+    frames = []
+    coro = task.get_coro()
+    while coro is not None:
+        frame = getattr(coro, "cr_frame", None) or getattr(coro, "gi_frame", None)
+        if frame is not None:
+            frames.append(frame)
+        coro = getattr(coro, "cr_await", None) or getattr(coro, "gi_yieldfrom", None)
+    return frames[frames.index(root):] if root in frames else frames
+
+
+class RequestProfiler:
+    """
+    1つのリクエストの処理中、別スレッドから一定間隔でスタックを採取するサンプリングプロファイラです。
+    結果は flamegraph.pl や speedscope で読める collapsed 形式（"関数;関数;... 回数"）で返します。
+
+    - イベントループのスレッドでこのリクエストのコードが動いていれば、そのスタックを "request" の下に記録します。
+    - await で中断している間は、中断しているコルーチンの連鎖を "<await>" として記録します。
+    - スレッドプールで動いているアプリのコードは "thread:<名前>" の下に記録します。
+      同時に処理している別のリクエストのものが含まれる場合があります。
+    """
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.samples = 0
+        self._stacks: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self, root_frame):
+        """
+        現在のタスクのプロファイルを開始します。root_frame より呼び出し元のフレームは記録しません。
+        """
+        self._root_frame = root_frame
+        self._loop_thread = threading.get_ident()
+        self._task = asyncio.current_task()
+        self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """
+        採取を止め、採取用のスレッドの終了を待ちます。スレッドの終了を待つため、イベントループからは直接呼ばないでください。
+        """
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        own = threading.get_ident()
+        names = {}
+        while not self._stop.wait(self.interval):
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                if ident == self._loop_thread:
+                    frames = _thread_stack(frame, stop=self._root_frame)
+                    if frames:
+                        self._record("request", frames)
+                    else:
+                        self._record("request", _await_stack(self._task, self._root_frame), "<await>")
+                    continue
+                frames = _thread_stack(frame)
+                if any(f.f_code.co_filename.startswith(APP_DIR) for f in frames):
+                    if ident not in names:
+                        names = {thread.ident: thread.name for thread in threading.enumerate()}
+                    self._record(f"thread:{names.get(ident, ident)}", frames)
+            self.samples += 1
+
+    def _record(self, root: str, frames: List, leaf: Optional[str] = None):
+        stack = [root] + [_label(frame) for frame in frames]
+        if leaf:
+            stack.append(leaf)
+        self._stacks[";".join(stack)] += 1
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self._stacks.most_common())
+
+
+def profile_filename(method: str, path: str) -> str:
+    safe_path = "".join(c if c.isalnum() else "_" for c in path).strip("_") or "root"
+    return f"{time.strftime('%Y%m%d-%H%M%S')}-{method}-{safe_path}-{os.getpid()}.collapsed"
@@ -0,0 +1,146 @@
+# app/core/rate_limit.py
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional
+from cachetools import LRUCache
+from starlette.requests import Request
+
+
+class InMemoryTokenBucketStore:
+    """
+    ワーカー内のメモリにトークンバケットを保持するストアです。
+    既存のキーに対する判定はバケットをその場で更新するだけで、新しいオブジェクトを作りません。
+    キーの数が max_keys を超えると、最も長く使われていないものから捨てます。
+    新しいキーを大量に送られても、利用中のキーのバケットが捨てられて制限がリセットされることはありません。
+    """
+    def __init__(self, max_keys: int = 100000):
+        self.max_keys = max_keys
+        # 名前空間 -> キー -> [残りトークン数, 最終更新時刻]
+        self._buckets: Dict[str, LRUCache] = {}
+        self._lock = threading.Lock()
+
+    def take(self, namespace: str, key: str, capacity: float, refill_rate: float, now: float) -> float:
+        """
+        トークンを1つ消費します。消費できた場合は 0 を、できない場合は次のトークンまでの秒数を返します。
+        """
+        with self._lock:
+            buckets = self._buckets.get(namespace)
+            if buckets is None:
+                buckets = self._buckets[namespace] = LRUCache(maxsize=self.max_keys)
+            # 参照したキーは最近使われたものとして扱われる
+            bucket = buckets.get(key)
+            if bucket is None:
+                buckets[key] = [capacity - 1, now]
+                return 0.0
+            tokens = min(capacity, bucket[0] + (now - bucket[1]) * refill_rate)
+            bucket[1] = now
+            if tokens < 1:
+                bucket[0] = tokens
+                return (1 - tokens) / refill_rate
+            bucket[0] = tokens - 1
+            return 0.0
+
+    def reset(self, namespace: str, key: str):
+        with self._lock:
+            self._buckets.get(namespace, {}).pop(key, None)
+
+
+class SQLiteTokenBucketStore:
+    """
+    同じホスト上の複数ワーカーでバケットを共有するためのストアです。ローカルの SQLite ファイルに保持します。
+    制限の状態は永続化する必要がないため、fsync は行いません。
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        with self._connection() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS token_buckets "
+                "(namespace TEXT NOT NULL, key TEXT NOT NULL, tokens REAL NOT NULL, updated REAL NOT NULL, "
+                "PRIMARY KEY (namespace, key))"
+            )
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=OFF")
+            self._local.conn = conn
+        return conn
+
+    def take(self, namespace: str, key: str, capacity: float, refill_rate: float, now: float) -> float:
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT tokens, updated FROM token_buckets WHERE namespace = ? AND key = ?", (namespace, key)
+            ).fetchone()
+            tokens = capacity if row is None else min(capacity, row[0] + (now - row[1]) * refill_rate)
+            retry_after = 0.0 if tokens >= 1 else (1 - tokens) / refill_rate
+            if tokens >= 1:
+                tokens -= 1
+            conn.execute(
+                "INSERT INTO token_buckets (namespace, key, tokens, updated) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(namespace, key) DO UPDATE SET tokens = excluded.tokens, updated = excluded.updated",
+                (namespace, key, tokens, now),
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return retry_after
+
+    def reset(self, namespace: str, key: str):
+        self._connection().execute("DELETE FROM token_buckets WHERE namespace = ? AND key = ?", (namespace, key))
+
+
+def create_store(backend: str, sqlite_path: str):
+    """
+    設定に応じてストアを作成します。backend は "memory" または "sqlite" です。
+    """
+    if backend == "sqlite":
+        return SQLiteTokenBucketStore(sqlite_path)
+    if backend == "memory":
+        return InMemoryTokenBucketStore()
+    raise ValueError(f"Unknown rate limit backend: {backend}")
+
+
+def client_ip(request: Request, trusted_hops: int) -> Optional[str]:
+    """
+    制限のキーにするクライアントのIPアドレスを返します。
+    trusted_hops が1以上の場合は、信頼できるプロキシが付けた X-Forwarded-For の値のうち右から trusted_hops 番目を使います
+    （それより左の値はクライアントが自由に書けるため使いません）。値が足りない場合は None を返します。
+    """
+    if trusted_hops <= 0:
+        return request.client.host if request.client else None
+    forwarded = [
+        address.strip()
+        for header in request.headers.getlist("x-forwarded-for")
+        for address in header.split(",")
+        if address.strip()
+    ]
+    if len(forwarded) < trusted_hops:
+        return None
+    return forwarded[-trusted_hops]
+
+
+class TokenBucketLimiter:
+    """
+    キーごとに per_seconds 秒あたり attempts 回までの試行を許可するトークンバケットです。
+    """
+    def __init__(self, store, attempts: int, per_seconds: float, namespace: str):
+        self.store = store
+        self.capacity = float(attempts)
+        self.refill_rate = attempts / per_seconds
+        self.namespace = namespace
+
+    def hit(self, key: str) -> float:
+        """
+        試行を1回記録します。制限内なら 0 を、超えていれば再試行できるまでの秒数を返します。
+        """
+        return self.store.take(self.namespace, key, self.capacity, self.refill_rate, time.time())
+
+    def reset(self, key: str):
+        self.store.reset(self.namespace, key)
@@ -0,0 +1,41 @@
+# app/core/responses.py
+from decimal import Decimal
+from typing import Any
+import orjson
+from fastapi import Response
+from fastapi.responses import ORJSONResponse
+from pydantic import BaseModel
+
+# 転送しないヘッダー。本文に合わせてレスポンス側で設定し直す
+_BODY_HEADERS = (b"content-length", b"content-type")
+
+
+def _default(value: Any):
+    # orjson が直接扱えない型だけを変換する（datetime・Enum・dict などは orjson がCで処理する）
+    if isinstance(value, BaseModel):
+        return value.dict()
+    if isinstance(value, Decimal):
+        return float(value)
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+
+class FastJSONResponse(ORJSONResponse):
+    """
+    orjson でシリアライズするJSONレスポンスです。アプリケーションの既定のレスポンスクラスとして使います。
+    Pydantic のモデルもそのまま渡せます。
+    """
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+
+
+def validated_response(content: Any, response: Response = None) -> FastJSONResponse:
+    """
+    検証済みの内容（from_orm で作ったスキーマのリストなど）を、FastAPI による response_model の再検証と
+    jsonable_encoder を通さずに返します。response_model は OpenAPI のドキュメントのために残してください。
+
+    エンドポイントで受け取った response に設定されたヘッダー（次ページのカーソル、ETag、Cookie など）は引き継ぎます。
+    """
+    result = FastJSONResponse(content)
+    if response is not None:
+        result.raw_headers.extend(header for header in response.headers.raw if header[0] not in _BODY_HEADERS)
+    return result
@@ -1,92 +1,118 @@
-from jose import jwt, JWTError
 from fastapi import HTTPException, Request, Depends
 from fastapi.security import OAuth2PasswordBearer
-from app.db.database import get_db
-from app.services.staff_service import StaffService
-from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+from app.db.database import SessionLocal
 from app.core.config import settings
-import httpx, logging
-from cachetools import TTLCache
+from app.services.principal_cache import Principal, principal_cache
+from app.services.token_revocation import revoked_tokens, revocation_id
+import logging, hashlib, time
+from cachetools import TLRUCache
+from app.core.jwks import SupabaseKeyProvider
 
 logger = logging.getLogger(__name__)
 
-# 公開鍵をキャッシュするためのTTLCache。最大1つの公開鍵を1時間（3600秒）キャッシュします。
-public_key_cache = TTLCache(maxsize=1, ttl=3600)
+# Supabaseの公開鍵を kid ごとに保持し、期限前にバックグラウンドで更新するプロバイダ
+supabase_keys = SupabaseKeyProvider(
+    settings.SUPABASE_URL,
+    settings.SUPABASE_KEY,
+    fallback_secret=settings.SUPABASE_JWT_SECRET,
+    ttl=settings.SUPABASE_KEYS_TTL_SECONDS,
+    refresh_before=settings.SUPABASE_KEYS_REFRESH_BEFORE_SECONDS,
+)
 
-# OAuth2スキームを使用してトークンを取得するための設定
-oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
+# 検証済みトークンのクレームを保持するキャッシュ。キーはトークンのダイジェストで、各エントリはトークンの exp で失効します。
+# exp を持たないトークンは TOKEN_CACHE_DEFAULT_TTL 秒だけ保持します。
+TOKEN_CACHE_DEFAULT_TTL = 300
+
+def _token_expires_at(key, payload, now):
+    exp = payload.get("exp")
+    return float(exp) if isinstance(exp, (int, float)) else now + TOKEN_CACHE_DEFAULT_TTL
 
-# Supabaseの公開鍵を取得する関数
-async def get_supabase_public_key():
-    # キャッシュに公開鍵があればそれを返す
-    if "public_key" in public_key_cache:
-        return public_key_cache["public_key"]
+verified_token_cache = TLRUCache(maxsize=settings.TOKEN_CACHE_MAXSIZE, ttu=_token_expires_at, timer=time.time)
+token_cache_stats = {"hits": 0, "misses": 0}
 
-    # APIキーとAuthorizationヘッダーを設定
-    headers = {
-        "apikey": settings.SUPABASE_KEY,
-        "Authorization": f"Bearer {settings.SUPABASE_KEY}"
-    }
+# OAuth2スキームを使用してトークンを取得するための設定
+oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
-    # Supabaseから公開鍵を取得
-    async with httpx.AsyncClient() as client:
-        response = await client.get(f"{settings.SUPABASE_URL}/auth/v1/jwt/keys", headers=headers)
-        if response.status_code == 404:
-            # 公開鍵が取得できない場合、プロジェクト設定から直接JWTシークレットを使用
-            return settings.SUPABASE_JWT_SECRET
-        response.raise_for_status()
-        keys = response.json()
-        public_key = keys[0]['publicKey']
-        # 公開鍵をキャッシュに保存
-        public_key_cache["public_key"] = public_key
-        return public_key
+# Supabaseの公開鍵を取得する関数（kid を指定するとその鍵を返す）
+async def get_supabase_public_key(kid: str = None):
+    return await supabase_keys.get_key(kid)
 
 # Supabaseのトークンを検証する関数
 async def verify_supabase_token(token: str):
+    # 同じトークンが検証済みであれば、署名の検証を省略してキャッシュしたペイロードを返す
+    key = hashlib.sha256(token.encode()).digest()
+    payload = verified_token_cache.get(key)
+    if payload is not None:
+        token_cache_stats["hits"] += 1
+        # 失効の判定はメモリ上のブルームフィルタで行い、DBには問い合わせない
+        return None if revoked_tokens.is_revoked(revocation_id(token, payload)) else payload
+    token_cache_stats["misses"] += 1
+
+    # python-jose（cryptography）の読み込みは重いため、最初に検証するときに読み込む
+    from jose import jwt, JWTError
     try:
+        # 非対称鍵で署名されたトークンは kid に対応する公開鍵で、それ以外はJWTシークレットで検証する
+        header = jwt.get_unverified_header(token)
+        algorithm = header.get("alg", "HS256")
+        if algorithm.startswith(("RS", "ES")):
+            signing_key = await get_supabase_public_key(header.get("kid"))
+            if signing_key is None:
+                logger.error("No Supabase public key for the token")
+                return None
+        else:
+            signing_key, algorithm = settings.SUPABASE_JWT_SECRET, "HS256"
         # トークンをデコードし、ペイロードを取得
-        logger.debug(f"Attempting to decode token: {token[:10]}...")
-        logger.debug(f"Using JWT secret: {settings.SUPABASE_JWT_SECRET[:5]}...")
         payload = jwt.decode(
             token,
-            settings.SUPABASE_JWT_SECRET,
-            algorithms=["HS256"],
+            signing_key,
+            algorithms=[algorithm],
             options={"verify_aud": False}
         )
-        logger.info(f"Token successfully decoded: {payload}")
-        return payload
     except JWTError as e:
         # トークンのデコードエラーをログに記録し、Noneを返す
         logger.error(f"JWT decoding error: {str(e)}")
-        logger.debug(f"Full token that failed decoding: {token}")
         return None
 
+    verified_token_cache[key] = payload
+    return None if revoked_tokens.is_revoked(revocation_id(token, payload)) else payload
+
+def get_token_cache_stats() -> dict:
+    """
+    トークン検証キャッシュのヒット数・ミス数と現在のエントリ数を返します。
+    """
+    return {**token_cache_stats, "size": verified_token_cache.currsize}
+
+def _load_principal(subject: str, email: str = None) -> Principal:
+    # キャッシュに無い場合のみセッションを開いてスタッフを読み込む
+    db = SessionLocal()
+    try:
+        return principal_cache.load(db, subject, email)
+    finally:
+        db.close()
+
 # 現在のユーザーを取得する関数
-async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+async def get_current_user(token: str = Depends(oauth2_scheme)) -> Principal:
     try:
         # トークンを検証し、ペイロードを取得
-        logger.debug(f"Verifying token: {token[:10]}...")
         payload = await verify_supabase_token(token)
-        logger.debug(f"Token payload: {payload}")
-        if payload is None:
+        if payload is None or not payload.get("sub"):
             # ペイロードが無効な場合、認証エラーを返す
             logger.warning("Invalid token payload")
             raise HTTPException(status_code=401, detail="Invalid authentication credentials")
 
-        # スタッフサービスを使用して、Supabase IDからスタッフ情報を取得
-        staff_service = StaffService()
-        logger.debug(f"Getting staff by Supabase ID: {payload['sub']}")
-        staff = await staff_service.get_staff_by_supabase_id(db, payload['sub'])
-        if not staff:
-            # スタッフが存在しない場合、新たに作成する
-            logger.info(f"Staff not found. Creating new staff for Supabase ID: {payload['sub']}")
-            staff = await staff_service.create_staff_from_supabase(db, payload)
-
-        staff_dict = staff.__dict__
-
-        logger.debug(f"Returning staff data: {staff_dict}")
-        return staff_dict
+        # よく使われるユーザーは、DBに問い合わせずキャッシュした Principal を返す
+        subject = payload["sub"]
+        principal = principal_cache.get(subject)
+        if principal is None:
+            principal = await run_in_threadpool(_load_principal, subject, payload.get("email"))
+        if principal is None:
+            logger.info("Staff not found for the token subject")
+            raise HTTPException(status_code=401, detail="Staff not found")
+        return principal
+    except HTTPException:
+        raise
     except Exception as e:
         # エラーが発生した場合、認証エラーを返す
         logger.error(f"Error in get_current_user: {str(e)}", exc_info=True)
-        raise HTTPException(status_code=401, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=401, detail="Invalid authentication credentials")
\ No newline at end of file
@@ -1,20 +1,95 @@
+import itertools
+import time
+from fastapi import Request, Response
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from app.core.config import settings
+from app.db.pool import InstrumentedAsyncQueuePool, InstrumentedQueuePool
+from app.db.query_stats import instrument_engine
 
 DATABASE_URL = settings.DATABASE_URL
 
-engine = create_engine(DATABASE_URL)
+# 接続プールの設定。チェックアウトの待ち時間を計測できるプールを使う（PROFILING_SECRET を指定して /internal/db-pool で確認できる）
+POOL_OPTIONS = dict(
+    pool_size=settings.DB_POOL_SIZE,
+    max_overflow=settings.DB_MAX_OVERFLOW,
+    pool_timeout=settings.DB_POOL_TIMEOUT,
+    pool_recycle=settings.DB_POOL_RECYCLE,
+    pool_pre_ping=settings.DB_POOL_PRE_PING,
+)
+
+engine = create_engine(DATABASE_URL, poolclass=InstrumentedQueuePool, **POOL_OPTIONS)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
-Base = declarative_base()
+# 非同期エンドポイント用のエンジン。ASYNC_DATABASE_URL が無ければ DATABASE_URL のドライバを非同期版に置き換える
+ASYNC_DRIVERS = {"mysql": "mysql+aiomysql", "sqlite": "sqlite+aiosqlite"}
+
+def to_async_url(url: str):
+    url = make_url(url)
+    return url.set(drivername=ASYNC_DRIVERS[url.get_backend_name()])
+
+async_engine = create_async_engine(
+    settings.ASYNC_DATABASE_URL or to_async_url(DATABASE_URL), poolclass=InstrumentedAsyncQueuePool, **POOL_OPTIONS
+)
+# コミット後も読み込み済みの値を使えるよう、expire_on_commit は無効にする（非同期では遅延読み込みができないため）
+AsyncSessionLocal = sessionmaker(async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
+# 読み取り専用のリクエスト（GET / HEAD）を振り分けるリードレプリカ。未設定の場合はすべてプライマリを使う
+replica_engines = [
+    create_async_engine(to_async_url(url), poolclass=InstrumentedAsyncQueuePool, **POOL_OPTIONS)
+    for url in settings.DATABASE_REPLICA_URLS
+]
+_replica_sessions = itertools.cycle([
+    sessionmaker(replica, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+    for replica in replica_engines
+])
+
+# リクエストごとのSQLの件数と時間を集計する（QueryStatsMiddleware）
+for _engine in [engine, async_engine.sync_engine] + [replica.sync_engine for replica in replica_engines]:
+    instrument_engine(_engine)
 
-Base.metadata.create_all(bind=engine)
+READ_METHODS = frozenset({"GET", "HEAD"})
+# 書き込みの直後、同じクライアントの読み取りをプライマリに向ける期限（UNIX時間）を保持する Cookie
+PRIMARY_UNTIL_COOKIE = "db_primary_until"
+
+Base = declarative_base()
 
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+def _reads_from_replica(request: Request) -> bool:
+    if not replica_engines or request.method not in READ_METHODS:
+        return False
+    try:
+        primary_until = float(request.cookies.get(PRIMARY_UNTIL_COOKIE, 0))
+    except ValueError:
+        primary_until = 0
+    # 書き込み直後は、レプリカの遅延で自分の変更が見えなくならないようプライマリから読む
+    return time.time() >= primary_until
+
+async def get_async_db(request: Request, response: Response):
+    """
+    リクエスト単位の AsyncSession を返します。
+    レプリカが設定されていれば、読み取り専用のリクエストはレプリカ（ラウンドロビン）に、それ以外はプライマリに接続します。
+    """
+    if _reads_from_replica(request):
+        session_factory = next(_replica_sessions)
+    else:
+        session_factory = AsyncSessionLocal
+        if replica_engines and request.method not in READ_METHODS:
+            response.set_cookie(
+                PRIMARY_UNTIL_COOKIE,
+                str(time.time() + settings.READ_YOUR_WRITES_SECONDS),
+                max_age=settings.READ_YOUR_WRITES_SECONDS,
+                httponly=True,
+                samesite="lax",
+            )
+    async with session_factory() as db:
+        yield db
\ No newline at end of file
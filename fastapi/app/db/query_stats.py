@@ -0,0 +1,102 @@
+# app/db/query_stats.py
+import re
+import time
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import event
+
+# 実行中のリクエストの集計。リクエストの外（バッチやバックグラウンドタスク）では None
+_current: ContextVar[Optional["QueryStats"]] = ContextVar("query_stats", default=None)
+
+_IN_LIST = re.compile(r"\(\s*(?:\?|%s|%\(\w+\)s|:\w+)(?:\s*,\s*(?:\?|%s|%\(\w+\)s|:\w+))*\s*\)")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_SPACES = re.compile(r"\s+")
+
+
+def normalize_sql(statement: str) -> str:
+    """
+    パラメータの数やリテラルだけが異なるSQLが同じ文字列になるよう正規化します。
+    IN 句のプレースホルダの並びは (...) に、数値と文字列のリテラルは ? に置き換えます。
+    """
+    statement = _SPACES.sub(" ", statement).strip()
+    statement = _STRING.sub("?", statement)
+    statement = _NUMBER.sub("?", statement)
+    return _IN_LIST.sub("(...)", statement)
+
+
+class QueryStats:
+    """
+    1つのリクエストで実行したSQLの件数と所要時間です。
+    statements は SQL ごとの [件数, 秒] で、文の記録を行うリクエストでのみ集計します。
+    """
+    __slots__ = ("count", "duration", "statements")
+
+    def __init__(self, capture_statements: bool = False):
+        self.count = 0
+        self.duration = 0.0
+        self.statements: Optional[Dict[str, List[float]]] = {} if capture_statements else None
+
+    def record(self, statement: str, elapsed: float):
+        self.count += 1
+        self.duration += elapsed
+        if self.statements is not None:
+            # 同じSQLはコンパイル済みキャッシュの同じ文字列になるため、ここでは正規化しない
+            entry = self.statements.get(statement)
+            if entry is None:
+                self.statements[statement] = [1, elapsed]
+            else:
+                entry[0] += 1
+                entry[1] += elapsed
+
+    def top_statements(self, limit: int = 5) -> List[Tuple[str, int, float]]:
+        """
+        正規化したSQLごとに件数と秒を合算し、時間のかかった順に返します。
+        """
+        merged: Dict[str, List[float]] = {}
+        for statement, (count, elapsed) in (self.statements or {}).items():
+            entry = merged.setdefault(normalize_sql(statement), [0, 0.0])
+            entry[0] += count
+            entry[1] += elapsed
+        ranked = sorted(merged.items(), key=lambda item: item[1][1], reverse=True)[:limit]
+        return [(statement, int(count), elapsed) for statement, (count, elapsed) in ranked]
+
+    def server_timing(self) -> str:
+        return f'db;dur={self.duration * 1000:.1f};desc="{self.count} queries"'
+
+
+def start_request(capture_statements: bool = False):
+    """
+    リクエストの集計を開始します。戻り値のトークンは finish_request() に渡します。
+    """
+    stats = QueryStats(capture_statements)
+    return stats, _current.set(stats)
+
+
+def finish_request(token):
+    _current.reset(token)
+
+
+def current_query_stats() -> Optional[QueryStats]:
+    return _current.get()
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current.get() is not None:
+        context._query_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _current.get()
+    started = getattr(context, "_query_started", None)
+    if stats is not None and started is not None:
+        stats.record(statement, time.perf_counter() - started)
+
+
+def instrument_engine(engine):
+    """
+    エンジンで実行したSQLを、実行中のリクエストの QueryStats に記録します。
+    非同期エンジンの場合は engine.sync_engine を渡します。
+    """
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
@@ -1,9 +1,20 @@
+import asyncio
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from .db.database import engine, Base
-from .api.v1 import customers, stores, staff, auth, bookings, role, event
+from .core.pagination import NEXT_CURSOR_HEADER
+from .core.responses import FastJSONResponse
+from .core import metrics
+from .core.config import settings
+from .middleware.metrics import MetricsMiddleware
+from .middleware.profiling import ProfilingMiddleware
+from .middleware.query_stats import QueryStatsMiddleware
+from .services.token_revocation import revoked_tokens
+from .core.security import supabase_keys
+from .api.v1 import customers, stores, staff, auth, bookings, role, event, availability, export, stats, internal
+from .api.v1 import metrics as metrics_api
 
-app = FastAPI()
+# レスポンスは既定で orjson によりシリアライズする
+app = FastAPI(default_response_class=FastJSONResponse)
 
 # CORSの設定を追加
 origins = [
@@ -16,10 +27,20 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],  # 全てのHTTPメソッドを許可
     allow_headers=["*"],  # 全てのHTTPヘッダーを許可
+    # ページングのカーソルと条件付きGET用のヘッダーをフロントエンドから読めるようにする
+    expose_headers=[NEXT_CURSOR_HEADER, "ETag", "Last-Modified", "Server-Timing"],
 )
 
-# モデルを使ってテーブルを作成
-Base.metadata.create_all(bind=engine)
+# リクエストごとのSQLの件数と時間を Server-Timing ヘッダーで返す
+app.add_middleware(QueryStatsMiddleware)
+# ルートごとのリクエスト数と処理時間を /metrics で公開する
+app.add_middleware(MetricsMiddleware)
+# 管理者用のシークレットを設定した場合のみ、X-Profile ヘッダーでリクエスト単位のプロファイルを有効にする
+if settings.PROFILING_SECRET:
+    app.add_middleware(ProfilingMiddleware)
+
+# テーブルの作成・変更は Alembic のマイグレーション（make migrate）で行う。
+# 起動時に create_all を実行するとテーブルごとにDBへの問い合わせが発生し、ワーカーの起動が遅くなる
 
 # 各ルーターをFastAPIアプリケーションに登録
 app.include_router(customers.router)
@@ -29,6 +50,26 @@ app.include_router(auth.router)
 app.include_router(bookings.router)
 app.include_router(role.router)
 app.include_router(event.router)
+app.include_router(availability.router)
+app.include_router(export.router)
+app.include_router(stats.router)
+app.include_router(internal.router)
+app.include_router(metrics_api.router)
+
+@app.on_event("startup")
+async def start_token_revocation_sync():
+    # 失効済みトークンを読み込んでから、ワーカー間の同期と期限切れの掃除を開始する
+    app.state.token_revocation_task = asyncio.create_task(revoked_tokens.run())
+    app.state.metrics_task = asyncio.create_task(metrics.run())
+
+@app.on_event("shutdown")
+async def stop_token_revocation_sync():
+    app.state.token_revocation_task.cancel()
+    app.state.metrics_task.cancel()
+    # 最後の状態を書き出してから、このワーカーを集計対象から外す
+    metrics.publish_process_metrics()
+    metrics.mark_process_dead()
+    await supabase_keys.aclose()
 
 @app.get("/")
 def read_root():
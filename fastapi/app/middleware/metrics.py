@@ -0,0 +1,48 @@
+# app/middleware/metrics.py
+import time
+from app.core.metrics import IN_PROGRESS, UNMATCHED_ROUTE, record_request
+
+
+class MetricsMiddleware:
+    """
+    リクエスト数・ステータス・処理時間を、ルートのテンプレート（/stores/{store_id}/bookings など）ごとに記録します。
+    処理時間にはレスポンス本文の送信までを含みます。
+    """
+    def __init__(self, app):
+        self.app = app
+        # エンドポイント関数 -> ルートのテンプレート。最初のリクエストで作成する
+        self._templates = None
+
+    def _route_template(self, scope) -> str:
+        endpoint = scope.get("endpoint")
+        if endpoint is None:
+            return UNMATCHED_ROUTE
+        if self._templates is None:
+            templates = {}
+            for route in scope["app"].routes:
+                if hasattr(route, "endpoint"):
+                    templates.setdefault(route.endpoint, route.path)
+            self._templates = templates
+        return self._templates.get(endpoint, UNMATCHED_ROUTE)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        IN_PROGRESS.inc()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            IN_PROGRESS.dec()
+            # ルーターがマッチしたエンドポイントを scope に書き込むため、処理後にテンプレートを解決できる
+            record_request(scope["method"], self._route_template(scope), status, time.perf_counter() - started)
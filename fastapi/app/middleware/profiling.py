@@ -0,0 +1,87 @@
+# app/middleware/profiling.py
+import hmac
+import logging
+import os
+import sys
+import threading
+from starlette.concurrency import run_in_threadpool
+from app.core.config import settings
+from app.core.profiling import RequestProfiler, profile_filename
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = b"x-profile"
+
+
+class ProfilingMiddleware:
+    """
+    X-Profile ヘッダーに PROFILING_SECRET を指定したリクエストだけをプロファイルします。
+    PROFILE_OUTPUT_DIR が設定されていれば結果をファイルに保存して X-Profile-File でファイル名を返し、
+    未設定の場合はレスポンスの本文の代わりに collapsed 形式のスタックを返します。
+
+    PROFILING_SECRET が未設定のときは main.py でこのミドルウェア自体を登録しないため、負荷はかかりません。
+    同じワーカーで同時にプロファイルできるのは1リクエストまでです。
+    """
+    def __init__(self, app):
+        self.app = app
+        self._busy = threading.Lock()
+
+    def _requested(self, scope) -> bool:
+        for name, value in scope["headers"]:
+            if name == PROFILE_HEADER:
+                return hmac.compare_digest(value, settings.PROFILING_SECRET.encode())
+        return False
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self._requested(scope) or not self._busy.acquire(blocking=False):
+            await self.app(scope, receive, send)
+            return
+
+        try:
+            await self._profile(scope, receive, send)
+        finally:
+            self._busy.release()
+
+    async def _profile(self, scope, receive, send):
+        profiler = RequestProfiler(interval=settings.PROFILE_SAMPLE_INTERVAL_MS / 1000)
+        output_dir = settings.PROFILE_OUTPUT_DIR
+        response_start = {}
+
+        async def send_or_discard(message):
+            if output_dir:
+                if message["type"] == "http.response.start":
+                    message["headers"] = list(message.get("headers", [])) + [
+                        (b"x-profile-file", filename.encode()),
+                    ]
+                await send(message)
+            elif message["type"] == "http.response.start":
+                # 本文はプロファイル結果に差し替えるため、元のステータスだけを残す
+                response_start.update(message)
+
+        filename = profile_filename(scope["method"], scope["path"])
+        profiler.start(sys._getframe())
+        try:
+            await self.app(scope, receive, send_or_discard)
+        finally:
+            # 採取中のサンプルが終わるまで待つため、イベントループを塞がないようスレッドプールで待つ
+            await run_in_threadpool(profiler.stop)
+
+        collapsed = profiler.collapsed()
+        logger.info(f"Profiled {scope['method']} {scope['path']}: {profiler.samples} samples")
+        if output_dir:
+            with open(os.path.join(output_dir, filename), "w") as f:
+                f.write(collapsed)
+            return
+
+        body = collapsed.encode()
+        await send({
+            "type": "http.response.start",
+            "status": 200,
+            "headers": [
+                (b"content-type", b"text/plain; charset=utf-8"),
+                (b"content-length", str(len(body)).encode()),
+                (b"x-profile-status", str(response_start.get("status", 500)).encode()),
+                (b"x-profile-samples", str(profiler.samples).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,50 @@
+# app/middleware/query_stats.py
+import logging
+import random
+from app.core.config import settings
+from app.db.query_stats import start_request, finish_request
+
+logger = logging.getLogger(__name__)
+
+
+class QueryStatsMiddleware:
+    """
+    リクエストごとに実行したSQLの件数と時間を集計し、Server-Timing ヘッダーで返します。
+    件数または時間がしきい値を超えたリクエストは、時間のかかったSQLとともにログに出力します。
+
+    ストリーミングのレスポンスでも本文の送信中に実行したSQLまで数えられるよう、
+    call_next 形式ではなく ASGI ミドルウェアとして実装しています。
+    SQLの文字列の記録は SQL_CAPTURE_SAMPLE_RATE の割合のリクエストでのみ行います。
+    """
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats, token = start_request(capture_statements=random.random() < settings.SQL_CAPTURE_SAMPLE_RATE)
+
+        async def send_with_server_timing(message):
+            if message["type"] == "http.response.start":
+                # ヘッダーの送信時点までに実行したSQLを返す
+                message.setdefault("headers", [])
+                message["headers"] = list(message["headers"]) + [(b"server-timing", stats.server_timing().encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_server_timing)
+        finally:
+            finish_request(token)
+            if stats.count >= settings.SLOW_REQUEST_QUERY_COUNT or stats.duration * 1000 >= settings.SLOW_REQUEST_DB_MS:
+                self._log_slow_request(scope, stats)
+
+    @staticmethod
+    def _log_slow_request(scope, stats):
+        lines = [f"{scope['method']} {scope['path']}: {stats.count} queries, {stats.duration * 1000:.1f}ms in DB"]
+        for statement, count, elapsed in stats.top_statements():
+            lines.append(f"  {count}x {elapsed * 1000:.1f}ms {statement}")
+        if stats.statements is None:
+            lines.append("  (SQL was not sampled for this request)")
+        logger.warning("\n".join(lines))
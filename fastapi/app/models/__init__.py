@@ -9,4 +9,5 @@ from .role import Role
 from .permission import Permission
 from .relation_of_role_and_permission import RelationOfRoleAndPermission
 from .event import Event
-from .relation_of_event_and_staff import RelationOfEventAndStaff
\ No newline at end of file
+from .relation_of_event_and_staff import RelationOfEventAndStaff
+from .daily_booking_stat import DailyBookingStat
\ No newline at end of file
@@ -1,9 +1,15 @@
-from sqlalchemy import Column, BigInteger, String, DateTime
+from sqlalchemy import Column, BigInteger, String, DateTime, Index
 from sqlalchemy.sql import func
 from app.db.database import Base
 
+# ログアウトで失効させたトークンを記録する。access_token にはトークンの jti（なければダイジェスト）を保存する
 class AccessToken(Base):
     __tablename__ = 'access_tokens'
+    __table_args__ = (
+        Index('ux_access_tokens_access_token', 'access_token', unique=True),
+        # 期限切れの行を掃除するためのインデックス
+        Index('ix_access_tokens_expired_at', 'expired_at'),
+    )
 
     id = Column(BigInteger, primary_key=True, index=True, autoincrement=True)
     access_token = Column(String(255), nullable=False)
@@ -0,0 +1,21 @@
+from sqlalchemy import Column, BigInteger, Integer, Date, DateTime, Index
+from sqlalchemy.sql import func
+from app.db.database import Base
+
+class DailyBookingStat(Base):
+    __tablename__ = 'daily_booking_stats'
+    # 店舗・日付の範囲検索と、(店舗, 日付, スタッフ) 単位の加算(UPSERT)に使う
+    __table_args__ = (
+        Index('ux_daily_booking_stats_store_date_staff', 'store_id', 'date', 'staff_id', unique=True),
+    )
+
+    id = Column(BigInteger, primary_key=True, index=True, autoincrement=True)
+    store_id = Column(BigInteger, nullable=False)
+    date = Column(Date, nullable=False)
+    # 担当スタッフが割り当てられていない予約は 0 として集計する
+    staff_id = Column(BigInteger, nullable=False, default=0)
+    booking_count = Column(Integer, nullable=False, default=0)
+    booked_minutes = Column(Integer, nullable=False, default=0)
+    canceled_count = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False)
@@ -1,10 +1,14 @@
-from sqlalchemy import Column, BigInteger, Integer, String, DateTime, Text, JSON, Enum, ForeignKey
+from sqlalchemy import Column, BigInteger, Integer, String, DateTime, Text, JSON, Enum, ForeignKey, Index
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from app.db.database import Base
 
 class Event(Base):
     __tablename__ = 'events'
+    # 店舗ごとの期間指定検索（カレンダー表示）用の複合インデックス
+    __table_args__ = (
+        Index('ix_events_store_id_from_at', 'store_id', 'from_at'),
+    )
 
     id = Column(BigInteger, primary_key=True, index=True, autoincrement=True)
     store_id = Column(BigInteger, ForeignKey('stores.id'), nullable=False)
@@ -9,6 +9,8 @@ class Staff(Base):
     id = Column(BigInteger, primary_key=True, index=True, autoincrement=True)
     store_id = Column(BigInteger, ForeignKey('stores.id'), nullable=False)
     role_id = Column(BigInteger, ForeignKey('roles.id'), nullable=False)
+    # 予約の追加・変更のたびに加算される。ワーカー間で予約インデックスの鮮度を判定するために使う
+    schedule_version = Column(BigInteger, nullable=False, default=0, server_default='0')
     created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False)
 
@@ -15,6 +15,9 @@ class Store(Base):
     address = Column(String(50), nullable=False)
     building = Column(String(50), nullable=False)
     phone_number = Column(String(11), nullable=False)
+    # 予約・顧客が変更されるたびに加算される。条件付きGET（ETag）の判定に使う
+    bookings_version = Column(BigInteger, nullable=False, default=0, server_default='0')
+    customers_version = Column(BigInteger, nullable=False, default=0, server_default='0')
     created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False)
 
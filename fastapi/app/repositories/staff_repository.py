@@ -1,14 +1,18 @@
 from sqlalchemy.orm import Session
 from app.models.staff import Staff
-from typing import List
-from app.db.database import get_db
+from typing import List, Optional
 
 class StaffRepository:
-    def __init__(self):
-        self.db = next(get_db())
+    def __init__(self, db: Session):
+        # 呼び出し元（リクエスト）のセッションを共有する。独自にセッションを開くと接続がプールに返らない
+        self.db = db
 
-    def get_all(self, skip: int = 0, limit: int = 100) -> List[Staff]:
-        return self.db.query(Staff).offset(skip).limit(limit).all()
+    def get_all(self, after_id: Optional[int] = None, limit: int = 100) -> List[Staff]:
+        # OFFSET は深いページほど遅くなるため、ID によるキーセットページングで取得する
+        query = self.db.query(Staff)
+        if after_id is not None:
+            query = query.filter(Staff.id > after_id)
+        return query.order_by(Staff.id).limit(limit).all()
 
     def get_by_id(self, staff_id: int) -> Staff:
         return self.db.query(Staff).filter(Staff.id == staff_id).first()
\ No newline at end of file
@@ -0,0 +1,12 @@
+# app/schemas/availability.py
+from pydantic import BaseModel
+from datetime import datetime
+from typing import List
+
+class AvailabilitySlotSchema(BaseModel):
+    from_at: datetime
+    to_at: datetime
+
+class StaffAvailabilitySchema(BaseModel):
+    staff_id: int
+    slots: List[AvailabilitySlotSchema]
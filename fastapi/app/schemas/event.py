@@ -34,6 +34,13 @@ class EventUpdateSchema(BaseModel):
     title: Optional[str] = None
     status: Optional[EventStatusEnum] = None
 
+# Bulk create result schema
+class EventBulkResultSchema(BaseModel):
+    index: int
+    status: str  # "created" or "failed"
+    id: Optional[int] = None
+    detail: Optional[str] = None
+
 # Response schema
 class EventResponseSchema(EventBaseSchema):
     id: int
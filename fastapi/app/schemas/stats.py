@@ -0,0 +1,13 @@
+# app/schemas/stats.py
+from pydantic import BaseModel
+from datetime import date
+
+class DailyBookingStatSchema(BaseModel):
+    date: date
+    staff_id: int
+    booking_count: int
+    booked_minutes: int
+    canceled_count: int
+
+    class Config:
+        orm_mode = True
@@ -1,34 +1,54 @@
 # app/services/auth_service.py
+import uuid
 from datetime import datetime, timedelta
-from jose import JWTError, jwt
-from passlib.context import CryptContext
 from sqlalchemy.orm import Session
 from fastapi import Depends, HTTPException, status
+from starlette.concurrency import run_in_threadpool
 from ..db.database import get_db
 from ..models.staff import Staff
 from ..models.staff_attribute import StaffAttribute
 from ..core.config import settings
+from ..core.passwords import password_hasher
+from ..core.rate_limit import TokenBucketLimiter, create_store
+from ..services.token_revocation import revoked_tokens, revocation_id
 from ..schemas.auth import LoginSchema, PasswordResetSchema, PasswordResetRequestSchema, PasswordResetVerifySchema
 from ..schemas.token import TokenData
 
-# パスワードハッシュ化のためのコンテキスト設定
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
 # JWTの設定
 SECRET_KEY = settings.SUPABASE_JWT_SECRET
 ALGORITHM = settings.ALGORITHM
 ACCESS_TOKEN_EXPIRE_MINUTES = settings.ACCESS_TOKEN_EXPIRE_MINUTES
 
+# ログイン試行の制限。メールアドレスごとと接続元IPごとに別のバケットを持つ
+_login_rate_limit_store = create_store(settings.LOGIN_RATE_LIMIT_BACKEND, settings.LOGIN_RATE_LIMIT_SQLITE_PATH)
+login_limiter_by_email = TokenBucketLimiter(
+    _login_rate_limit_store, settings.LOGIN_ATTEMPTS_PER_EMAIL, settings.LOGIN_RATE_LIMIT_WINDOW_SECONDS, "login:email"
+)
+login_limiter_by_ip = TokenBucketLimiter(
+    _login_rate_limit_store, settings.LOGIN_ATTEMPTS_PER_IP, settings.LOGIN_RATE_LIMIT_WINDOW_SECONDS, "login:ip"
+)
+
 class AuthService:
     def __init__(self, db: Session = Depends(get_db)):
         self.db = db
 
-    def login(self, data: LoginSchema):
+    async def login(self, data: LoginSchema, client_ip: str = None):
         """
         ログイン処理を行います。
+        試行回数の上限を超えた場合は、DBや bcrypt に触れる前に 429 を返します。
         """
+        email = data.email.lower()
+        # SQLite のストアはワーカー間のロック待ちでブロックするため、イベントループではなくスレッドプールで実行する
+        retry_after = await run_in_threadpool(self._hit_login_limits, email, client_ip)
+        if retry_after:
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Too many login attempts",
+                headers={"Retry-After": str(int(retry_after) + 1)},
+            )
+
         # Emailでスタッフを検索して認証
-        staff = self.authenticate_staff(data.email, data.password)
+        staff = await self.authenticate_staff(data.email, data.password)
         if not staff:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
@@ -36,8 +56,13 @@ class AuthService:
                 headers={"WWW-Authenticate": "Bearer"},
             )
 
+        # ログインに成功したら、そのメールアドレスの失敗回数はリセットする
+        await run_in_threadpool(login_limiter_by_email.reset, email)
+
         # StaffAttribute からメールアドレスを取得
-        staff_attribute = self.db.query(StaffAttribute).filter(StaffAttribute.staff_id == staff.id).first()
+        staff_attribute = await run_in_threadpool(
+            lambda: self.db.query(StaffAttribute).filter(StaffAttribute.staff_id == staff.id).first()
+        )
 
         # アクセストークンの生成
         access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
@@ -48,65 +73,100 @@ class AuthService:
         # トークンを返す
         return {"access_token": access_token, "token_type": "bearer"}
 
-    def verify_password(self, plain_password: str, hashed_password: str) -> bool:
+    @staticmethod
+    def _hit_login_limits(email: str, client_ip: str = None) -> float:
+        # 接続元IPが分からない場合は、メールアドレスごとの制限だけを行う
+        return (login_limiter_by_ip.hit(client_ip) if client_ip else 0.0) or login_limiter_by_email.hit(email)
+
+    async def verify_password(self, plain_password: str, hashed_password: str) -> bool:
         """
-        パスワードが正しいかを確認します。
+        パスワードが正しいかを確認します（専用のハッシュ化プールで実行）。
         """
-        return pwd_context.verify(plain_password, hashed_password)
+        verified, _ = await password_hasher.verify_and_update(plain_password, hashed_password)
+        return verified
 
-    def get_password_hash(self, password: str) -> str:
+    async def get_password_hash(self, password: str) -> str:
         """
-        パスワードをハッシュ化します。
+        パスワードをハッシュ化します（専用のハッシュ化プールで実行）。
         """
-        return pwd_context.hash(password)
+        return await password_hasher.hash(password)
 
     def create_access_token(self, data: dict, expires_delta: timedelta = None) -> str:
         """
         アクセストークンを作成します。
         """
+        from jose import jwt
         to_encode = data.copy()
         if expires_delta:
             expire = datetime.utcnow() + expires_delta
         else:
             expire = datetime.utcnow() + timedelta(minutes=15)
-        to_encode.update({"exp": expire})
+        # ログアウト時にトークン単位で失効できるよう、一意なIDを付与する
+        to_encode.update({"exp": expire, "jti": uuid.uuid4().hex})
         encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
         return encoded_jwt
 
-    def authenticate_staff(self, email: str, password: str) -> Staff:
+    async def authenticate_staff(self, email: str, password: str) -> Staff:
         """
         スタッフの認証を行います。
+        DBアクセスはスレッドプールで、bcrypt の検証は専用のハッシュ化プールで実行し、イベントループを塞ぎません。
         """
         # StaffAttributeからemailを取得して対応するStaffを見つける
-        staff_attribute = self.db.query(StaffAttribute).filter(StaffAttribute.mail_address == email).first()
+        staff_attribute = await run_in_threadpool(
+            lambda: self.db.query(StaffAttribute).filter(StaffAttribute.mail_address == email).first()
+        )
 
         if not staff_attribute:
             return None
 
         # StaffAttributeから関連するStaffを取得
-        staff = self.db.query(Staff).filter(Staff.id == staff_attribute.staff_id).first()
+        staff = await run_in_threadpool(
+            lambda: self.db.query(Staff).filter(Staff.id == staff_attribute.staff_id).first()
+        )
+        if not staff:
+            return None
 
-        if not staff or not self.verify_password(password, staff_attribute.hashed_password):
+        verified, new_hash = await password_hasher.verify_and_update(password, staff_attribute.hashed_password)
+        if not verified:
             return None
+        if new_hash:
+            # bcrypt のコストが変更されていれば、新しいコストで再ハッシュして保存する
+            staff_attribute.hashed_password = new_hash
+            await run_in_threadpool(self.db.commit)
         return staff
 
-    def get_current_staff(self, token: str) -> Staff:
+    def decode_token(self, token: str) -> dict:
         """
-        現在のスタッフを取得します。
+        トークンを検証してペイロードを返します。ログアウトで失効したトークンは無効として扱います。
         """
         credentials_exception = HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Could not validate credentials",
             headers={"WWW-Authenticate": "Bearer"},
         )
+        from jose import JWTError, jwt
         try:
             payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-            email: str = payload.get("sub")
-            if email is None:
-                raise credentials_exception
-            token_data = TokenData(email=email)
         except JWTError:
             raise credentials_exception
+        if revoked_tokens.is_revoked(revocation_id(token, payload)):
+            raise credentials_exception
+        return payload
+
+    def get_current_staff(self, token: str) -> Staff:
+        """
+        現在のスタッフを取得します。
+        """
+        credentials_exception = HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+        payload = self.decode_token(token)
+        email: str = payload.get("sub")
+        if email is None:
+            raise credentials_exception
+        token_data = TokenData(email=email)
         staff = self.db.query(Staff).join(StaffAttribute).filter(StaffAttribute.mail_address == token_data.email).first()
         if staff is None:
             raise credentials_exception
@@ -119,6 +179,7 @@ class AuthService:
         """
         # トークンの有効性を確認
         try:
+            payload = self.decode_token(token)
             staff = self.get_current_staff(token)
         except HTTPException:
             raise HTTPException(
@@ -127,15 +188,24 @@ class AuthService:
                 headers={"WWW-Authenticate": "Bearer"},
             )
 
-        # ここでブラックリストへの追加や他の処理を行う
+        # 失効リストに追加する。行はトークンの有効期限が過ぎると定期的に削除される
+        revoked_tokens.revoke(
+            self.db,
+            revocation_id(token, payload),
+            str(staff.id),
+            datetime.utcfromtimestamp(payload["exp"]) if "exp" in payload
+            else datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES),
+        )
         return {"message": "Successfully logged out"}
 
-    def reset_password(self, data: PasswordResetSchema):
+    async def reset_password(self, data: PasswordResetSchema):
         """
         パスワードをリセットします。
         """
         # StaffAttributeからemailでスタッフを取得
-        staff_attribute = self.db.query(StaffAttribute).filter(StaffAttribute.mail_address == data.email).first()
+        staff_attribute = await run_in_threadpool(
+            lambda: self.db.query(StaffAttribute).filter(StaffAttribute.mail_address == data.email).first()
+        )
 
         if not staff_attribute:
             raise HTTPException(
@@ -144,9 +214,9 @@ class AuthService:
             )
 
         # 新しいパスワードをハッシュ化して保存
-        hashed_password = self.get_password_hash(data.new_password)
+        hashed_password = await password_hasher.hash(data.new_password)
         staff_attribute.hashed_password = hashed_password
-        self.db.commit()
+        await run_in_threadpool(self.db.commit)
 
         return {"message": "Password reset successfully"}
 
@@ -171,9 +241,11 @@ class AuthService:
         # ここでは単にリセットトークンを返します。
         return {"message": "Password reset link sent", "reset_token": reset_token}
 
-    def verify_password_reset(self, data: PasswordResetVerifySchema):
+    async def verify_password_reset(self, data: PasswordResetVerifySchema):
         # Emailでスタッフを検索
-        staff = self.db.query(Staff).join(StaffAttribute).filter(StaffAttribute.mail_address == data.email).first()
+        staff = await run_in_threadpool(
+            lambda: self.db.query(Staff).join(StaffAttribute).filter(StaffAttribute.mail_address == data.email).first()
+        )
         if not staff:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -181,12 +253,14 @@ class AuthService:
             )
 
         # 新しいパスワードをハッシュ化
-        hashed_password = self.get_password_hash(data.new_password)
+        hashed_password = await password_hasher.hash(data.new_password)
 
         # パスワードを更新
-        staff_attribute = self.db.query(StaffAttribute).filter(StaffAttribute.staff_id == staff.id).first()
+        staff_attribute = await run_in_threadpool(
+            lambda: self.db.query(StaffAttribute).filter(StaffAttribute.staff_id == staff.id).first()
+        )
         staff_attribute.hashed_password = hashed_password
-        self.db.commit()
+        await run_in_threadpool(self.db.commit)
 
         return {"msg": "Password reset successful"}
 
@@ -0,0 +1,109 @@
+# backend/app/services/availability_service.py
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+from sqlalchemy.orm import Session
+from fastapi import Depends, HTTPException, status
+from app.core.config import settings
+from app.db.database import get_db
+from app.models.event import Event
+from app.models.relation_of_event_and_staff import RelationOfEventAndStaff
+from app.models.staff import Staff
+from app.schemas.availability import AvailabilitySlotSchema, StaffAvailabilitySchema
+from app.services.schedule_index import MAX_EVENT_SPAN, naive
+
+class AvailabilityService:
+    """
+    空き枠検索を行います。
+    検索期間を固定長のスロットに区切り、スタッフごとに「空いているスロット」をビット列(int)で表します。
+    予約済みの区間はビットマスクでまとめてクリアし、必要な長さの連続した空きもビット演算で求めます。
+    """
+    def __init__(self, db: Session):
+        self.db = db
+
+    def get_availability(
+        self,
+        store_id: int,
+        from_at: datetime,
+        to_at: datetime,
+        duration: int,
+        staff_id: Optional[int] = None,
+    ) -> List[StaffAvailabilitySchema]:
+        from_at, to_at = naive(from_at), naive(to_at)
+        if from_at >= to_at:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="'from' must be earlier than 'to'")
+        if to_at - from_at > timedelta(days=settings.AVAILABILITY_MAX_DAYS):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Search range must be {settings.AVAILABILITY_MAX_DAYS} days or less"
+            )
+        if duration <= 0:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="duration must be positive")
+
+        slot = timedelta(minutes=settings.AVAILABILITY_SLOT_MINUTES)
+        slot_seconds = slot.total_seconds()
+        slot_count = int((to_at - from_at).total_seconds() // slot_seconds)
+        # 予約に必要なスロット数（端数は切り上げ）
+        needed = -(-duration // settings.AVAILABILITY_SLOT_MINUTES)
+
+        staff_query = self.db.query(Staff.id).filter(Staff.store_id == store_id)
+        if staff_id is not None:
+            staff_query = staff_query.filter(Staff.id == staff_id)
+        staff_ids = [row.id for row in staff_query.order_by(Staff.id).all()]
+        if staff_id is not None and not staff_ids:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Staff not found")
+
+        # 全スロットが空いている状態から始める
+        all_free = (1 << slot_count) - 1
+        free: Dict[int, int] = {sid: all_free for sid in staff_ids}
+
+        # 検索期間に掛かる有効な予約を1クエリで取得する
+        rows = (
+            self.db.query(RelationOfEventAndStaff.staff_id, Event.from_at, Event.to_at)
+            .join(Event, Event.id == RelationOfEventAndStaff.event_id)
+            .filter(
+                Event.store_id == store_id,
+                Event.from_at >= from_at - MAX_EVENT_SPAN,
+                Event.from_at < to_at,
+                Event.to_at > from_at,
+                Event.status == 'active',
+                RelationOfEventAndStaff.staff_id.in_(staff_ids),
+            )
+            .all()
+        ) if staff_ids else []
+
+        for sid, booked_from, booked_to in rows:
+            # 予約に少しでも掛かるスロットを埋まりとしてクリアする
+            start = max(0, int((naive(booked_from) - from_at).total_seconds() // slot_seconds))
+            end = min(slot_count, -int(-(naive(booked_to) - from_at).total_seconds() // slot_seconds))
+            if start < end:
+                free[sid] &= ~(((1 << (end - start)) - 1) << start)
+
+        results = []
+        for sid in staff_ids:
+            starts = self._fit(free[sid], needed)
+            slots = []
+            while starts:
+                lowest = starts & -starts
+                index = lowest.bit_length() - 1
+                starts ^= lowest
+                slot_from = from_at + slot * index
+                slots.append(AvailabilitySlotSchema(from_at=slot_from, to_at=slot_from + timedelta(minutes=duration)))
+            results.append(StaffAvailabilitySchema(staff_id=sid, slots=slots))
+        return results
+
+    @staticmethod
+    def _fit(free: int, needed: int) -> int:
+        """
+        needed 個以上連続して空いているスロットの開始位置を表すビット列を返します。
+        シフト幅を倍々にしながら AND を取るため、演算回数は O(log needed) です。
+        """
+        fit = free
+        width = 1
+        while width < needed:
+            step = min(width, needed - width)
+            fit &= fit >> step
+            width += step
+        return fit
+
+def get_availability_service(db: Session = Depends(get_db)) -> AvailabilityService:
+    return AvailabilityService(db)
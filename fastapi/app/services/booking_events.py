@@ -0,0 +1,67 @@
+# backend/app/services/booking_events.py
+import asyncio
+import json
+import threading
+from contextlib import asynccontextmanager
+from typing import Any, Dict, Set, Tuple
+
+# 購読者ごとに溜めておける未送信メッセージ数。超えた場合は再取得（resync）を促す
+SUBSCRIBER_QUEUE_SIZE = 100
+
+
+class BookingEventBroker:
+    """
+    予約の作成・更新・削除を店舗ごとの購読者に配信する、プロセス内の Pub/Sub です。
+
+    publish() は同期エンドポイント（スレッドプール）からも呼べるよう、
+    各購読者のイベントループに call_soon_threadsafe でメッセージを渡します。
+    複数ワーカー間で配信する場合は、同じ publish / subscribe を持つブローカー
+    （ローカルの Redis など）に差し替えてください。
+    """
+    def __init__(self):
+        self._subscribers: Dict[int, Set[Tuple[asyncio.AbstractEventLoop, asyncio.Queue]]] = {}
+        self._lock = threading.Lock()
+
+    def has_subscribers(self, store_id: int) -> bool:
+        # 購読者がいない店舗ではメッセージの組み立て自体を省略できるようにする
+        return store_id in self._subscribers
+
+    def publish(self, store_id: int, message: Dict[str, Any]):
+        data = json.dumps(message, ensure_ascii=False, default=str)
+        with self._lock:
+            subscribers = list(self._subscribers.get(store_id, ()))
+        for loop, queue in subscribers:
+            try:
+                loop.call_soon_threadsafe(self._deliver, queue, data)
+            except RuntimeError:
+                # イベントループが既に閉じている購読者は無視する
+                pass
+
+    @staticmethod
+    def _deliver(queue: asyncio.Queue, data: str):
+        try:
+            queue.put_nowait(data)
+        except asyncio.QueueFull:
+            # 受信が追いつかない購読者には溜まった差分を捨て、一覧の再取得を促す
+            while not queue.empty():
+                queue.get_nowait()
+            queue.put_nowait(json.dumps({"type": "resync"}))
+
+    @asynccontextmanager
+    async def subscribe(self, store_id: int):
+        entry = (asyncio.get_running_loop(), asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE))
+        with self._lock:
+            self._subscribers.setdefault(store_id, set()).add(entry)
+        try:
+            yield entry[1]
+        finally:
+            with self._lock:
+                subscribers = self._subscribers.get(store_id)
+                if subscribers is not None:
+                    subscribers.discard(entry)
+                    if not subscribers:
+                        del self._subscribers[store_id]
+
+
+# プロセス全体で共有するブローカー
+booking_events = BookingEventBroker()
@@ -1,121 +1,102 @@
 # customer_service.py
-from sqlalchemy.orm import Session
-from app.db.database import get_db
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db.database import get_async_db
 from app.models.customer import Customer
 from app.schemas.customer import CustomerCreateSchema, CustomerUpdateSchema
-from fastapi import Depends, HTTPException
+from fastapi import Depends
 from app.models.customer_attribute import CustomerAttribute
-from sqlalchemy.orm import joinedload
+from sqlalchemy.orm import selectinload
+from typing import Optional
 from fastapi.encoders import jsonable_encoder
-
-class CustomerService:
-    def __init__(self, db: Session):
-        # データベースセッションを初期化し、インスタンス変数として保存します。
+from app.services.store_service import AsyncStoreService
+
+def customer_attributes_as_dicts(customer: Customer) -> list:
+    # customer_attributesを取得し、正しい形式でリストに格納
+    return [
+        {
+            "name": attr.name,
+            "name_ruby": attr.name_ruby,
+            "mail_address": attr.mail_address,
+            "sex": attr.sex,
+            "phone_number": attr.phone_number,
+            "postal_code": attr.postal_code,
+            "prefecture": attr.prefecture,
+            "street": attr.street,
+            "address": attr.address,
+            "building": attr.building,
+            "created_at": attr.created_at,
+            "updated_at": attr.updated_at
+        }
+        for attr in customer.customer_attributes
+    ]
+
+class AsyncCustomerService:
+    """
+    顧客を扱うサービスです。非同期では遅延読み込みができないため、顧客属性は常にまとめて読み込みます。
+    """
+    def __init__(self, db: AsyncSession):
         self.db = db
-
-    def get_customers(self, store_id: int):
-        # 指定されたstore_idに関連するすべての顧客をデータベースから取得します。
-        return self.db.query(Customer).options(joinedload(Customer.customer_attributes)).filter(Customer.store_id == store_id).all()
-
-
-    def create_customer(self, store_id: int, data: CustomerCreateSchema):
-        # Customerを作成
+        self.store_service = AsyncStoreService(db)
+
+    def _select_customers(self):
+        return select(Customer).options(selectinload(Customer.customer_attributes))
+
+    async def get_customers(self, store_id: int, after_id: Optional[int] = None, limit: Optional[int] = None):
+        stmt = self._select_customers().where(Customer.store_id == store_id)
+        if after_id is not None:
+            stmt = stmt.where(Customer.id > after_id)
+        stmt = stmt.order_by(Customer.id)
+        if limit is not None:
+            stmt = stmt.limit(limit + 1)
+        result = await self.db.execute(stmt)
+        return result.scalars().all()
+
+    async def create_customer(self, store_id: int, data: CustomerCreateSchema):
         new_customer = Customer(store_id=store_id)
         self.db.add(new_customer)
-        self.db.flush()  # IDを取得するためにフラッシュ
+        await self.db.flush()  # IDを取得するためにフラッシュ
 
-        # customer_attributes を取得し、辞書であることを確認
         attribute_data = data.customer_attributes
         if isinstance(attribute_data, tuple):
-            # タプルの場合は適切に変換する
-            attribute_data = attribute_data[0]  # タプルの最初の要素を使用する
-
-        # CustomerAttributeを作成
-        new_attribute = CustomerAttribute(
-            customer_id=new_customer.id,
-            **attribute_data.dict()  # ここで辞書として処理
-        )
-        self.db.add(new_attribute)
-        self.db.commit()
-        self.db.refresh(new_customer)
-
-        return new_customer
-
-    def get_customer(self, store_id: int, customer_id: int):
-        # 指定されたstore_idとcustomer_idに一致する単一の顧客を取得します。
-        return self.db.query(Customer).filter(Customer.store_id == store_id, Customer.id == customer_id).first()
-
-    def update_customer(self, store_id: int, customer_id: int, data: CustomerUpdateSchema):
-        # 指定されたstore_idとcustomer_idに一致する顧客を取得します。
-        customer = self.get_customer(store_id, customer_id)
-
+            attribute_data = attribute_data[0]
+        self.db.add(CustomerAttribute(customer_id=new_customer.id, **attribute_data.dict()))
+        await self.store_service.bump_change_version(store_id, "customers")
+        await self.db.commit()
+        return await self.get_customer(store_id, new_customer.id, populate_existing=True)
+
+    async def get_customer(self, store_id: int, customer_id: int, populate_existing: bool = False):
+        stmt = self._select_customers().where(Customer.store_id == store_id, Customer.id == customer_id)
+        if populate_existing:
+            # コミット後にDB側で設定された値（作成日時など）を読み直す
+            stmt = stmt.execution_options(populate_existing=True)
+        result = await self.db.execute(stmt)
+        return result.scalars().first()
+
+    async def update_customer(self, store_id: int, customer_id: int, data: CustomerUpdateSchema):
+        customer = await self.get_customer(store_id, customer_id)
         if customer:
-            # customer_attributesを更新
             attribute_data = data.customer_attributes
             if customer.customer_attributes:
-                # 既存の顧客属性がある場合、最初の属性を取得して更新
                 attribute = customer.customer_attributes[0]
                 for key, value in attribute_data.dict().items():
                     setattr(attribute, key, value)
             else:
-                # 顧客属性がない場合、新たに作成して関連付け
-                new_attribute = CustomerAttribute(
-                    customer_id=customer.id,
-                    **attribute_data.dict()
-                )
-                self.db.add(new_attribute)
-            # 顧客情報全体をコミットして保存します。
-            self.db.commit()
-            self.db.refresh(customer)
-
-        # 更新された顧客オブジェクトを返します。
+                self.db.add(CustomerAttribute(customer_id=customer.id, **attribute_data.dict()))
+            await self.store_service.bump_change_version(store_id, "customers")
+            await self.db.commit()
+            customer = await self.get_customer(store_id, customer_id, populate_existing=True)
         return customer
 
-    def delete_customer(self, store_id: int, customer_id: int):
-        # 指定されたstore_idとcustomer_idに一致する顧客を取得します。
-        customer = self.get_customer(store_id, customer_id)
-
+    async def delete_customer(self, store_id: int, customer_id: int):
+        customer = await self.get_customer(store_id, customer_id)
         if customer:
-            # まず関連するcustomer_attributesを削除
             for attribute in customer.customer_attributes:
-                self.db.delete(attribute)
-
-            # その後、顧客自体を削除します
-            self.db.delete(customer)
-
-            # 変更をコミットして保存します。
-            self.db.commit()
-
-        # 削除された顧客オブジェクトを返します。
+                await self.db.delete(attribute)
+            await self.db.delete(customer)
+            await self.store_service.bump_change_version(store_id, "customers")
+            await self.db.commit()
         return jsonable_encoder(customer, exclude={"customer_attributes"})
 
-    # サービス内でCustomerとその関連するCustomerAttributesを取得するメソッド
-    def get_customer_with_attributes(self, customer_id: int):
-        customer = self.db.query(Customer).filter(Customer.id == customer_id).first()
-        if not customer:
-            raise HTTPException(status_code=404, detail="Customer not found")
-
-        # customer_attributesを取得し、正しい形式でリストに格納
-        customer_attributes = [
-            {
-                "name": attr.name,
-                "name_ruby": attr.name_ruby,
-                "mail_address": attr.mail_address,
-                "sex": attr.sex,
-                "phone_number": attr.phone_number,
-                "postal_code": attr.postal_code,
-                "prefecture": attr.prefecture,
-                "street": attr.street,
-                "address": attr.address,
-                "building": attr.building,
-                "created_at": attr.created_at,
-                "updated_at": attr.updated_at
-            }
-            for attr in customer.customer_attributes
-        ]
-
-        return customer, customer_attributes  # customer_attributesはリスト
-
-def get_customer_service(db: Session = Depends(get_db)) -> CustomerService:
-    # 依存関係としてデータベースセッションを取得し、CustomerServiceのインスタンスを返します。
-    return CustomerService(db=db)
\ No newline at end of file
+def get_async_customer_service(db: AsyncSession = Depends(get_async_db)) -> AsyncCustomerService:
+    return AsyncCustomerService(db=db)
\ No newline at end of file
@@ -1,24 +1,84 @@
 # backend/app/services/event_service.py
-from sqlalchemy.orm import Session, joinedload
+from datetime import datetime
+from typing import List, Optional, Tuple
+from sqlalchemy import and_, insert, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, joinedload, selectinload
 from fastapi import HTTPException, status
+from fastapi.encoders import jsonable_encoder
+from starlette.concurrency import run_in_threadpool
 from app.models.event import Event
-from app.schemas.event import EventCreateSchema, EventUpdateSchema, EventResponseSchema
-from app.db.database import get_db
+from app.schemas.event import EventCreateSchema, EventUpdateSchema, EventResponseSchema, EventStatusEnum, EventBulkResultSchema
+from app.core.config import settings
+from app.db.database import get_db, get_async_db, SessionLocal
 from fastapi import Depends
 from app.models.relation_of_event_and_staff import RelationOfEventAndStaff
 from app.models.staff import Staff
+from app.services.schedule_index import schedule_index, naive
+from app.services.stats_service import StatsService, booking_contribution
+from app.services.store_service import StoreService
+from app.services.booking_events import booking_events
+
+# レスポンス(EventResponseSchema)で参照するスタッフとスタッフ属性をまとめて読み込むためのオプション。
+# selectinload を使うことで、イベント件数に関係なくクエリ数が一定になる（N+1の回避）。
+EVENT_RESPONSE_LOAD_OPTIONS = (
+    selectinload(Event.staffs).selectinload(Staff.staff_attributes),
+)
 
 class EventService:
     def __init__(self, db: Session):
         self.db = db
+        self.stats = StatsService(db)
+        self.store_service = StoreService(db)
 
-    def get_events(self, store_id: int):
-        events = self.db.query(Event).filter(Event.store_id == store_id).all()
+    def get_events(
+        self,
+        store_id: int,
+        from_at: Optional[datetime] = None,
+        to_at: Optional[datetime] = None,
+        staff_id: Optional[int] = None,
+        status: Optional[EventStatusEnum] = None,
+        cursor: Optional[Tuple[datetime, int]] = None,
+        limit: Optional[int] = None,
+    ):
+        """
+        店舗のイベントを取得します。
+        from_at / to_at を指定すると、開始日時がその範囲 [from_at, to_at) に含まれるイベントのみを返します。
+        (store_id, from_at) の複合インデックスで範囲検索できるよう、条件はすべてSQLで絞り込みます。
+        limit を指定すると (from_at, id) 順のキーセットページングになり、cursor より後ろを最大 limit + 1 件返します。
+        """
+        query = self.db.query(Event)\
+            .options(*EVENT_RESPONSE_LOAD_OPTIONS)\
+            .filter(Event.store_id == store_id)
+        if from_at is not None:
+            query = query.filter(Event.from_at >= from_at)
+        if to_at is not None:
+            query = query.filter(Event.from_at < to_at)
+        if status is not None:
+            query = query.filter(Event.status == status.value)
+        if staff_id is not None:
+            # 指定スタッフが担当しているイベントのみに絞り込む
+            query = query.join(RelationOfEventAndStaff, RelationOfEventAndStaff.event_id == Event.id)\
+                .filter(RelationOfEventAndStaff.staff_id == staff_id)
+        if cursor is not None:
+            cursor_from_at, cursor_id = cursor
+            query = query.filter(or_(
+                Event.from_at > cursor_from_at,
+                and_(Event.from_at == cursor_from_at, Event.id > cursor_id),
+            ))
+        query = query.order_by(Event.from_at, Event.id)
+        if limit is not None:
+            query = query.limit(limit + 1)
+        events = query.all()
         return events
 
     def create_event(self, store_id: int, data: EventCreateSchema) -> Event:
+        if data.from_at >= data.to_at:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="from_at must be earlier than to_at")
+
         # from_atとto_atの差分を計算してduration_by_minutesに設定
         duration = int((data.to_at - data.from_at).total_seconds() / 60)
+        staff_ids = data.staff_ids or []
 
         # Event インスタンスを作成
         new_event = Event(
@@ -32,43 +92,200 @@ class EventService:
             status=data.status,
             title=data.title,
         )
-        # データベースに追加
-        self.db.add(new_event)
-        self.db.commit()
-        self.db.refresh(new_event)
+        # キャンセル済みの予約は枠を占有しないため、重複チェックは有効な予約のみ行う
+        active = data.status == EventStatusEnum.active
+        with schedule_index.reserve(self.db, store_id, staff_ids, data.from_at, data.to_at, active=active) as reservation:
+            # データベースに追加（IDを取得するためにフラッシュ）
+            self.db.add(new_event)
+            self.db.flush()
 
-        # staff_ids がある場合は、relations_of_event_and_staffs テーブルにデータを保存
-        if hasattr(data, 'staff_ids') and data.staff_ids:
-            for staff_id in data.staff_ids:
+            # staff_ids がある場合は、relations_of_event_and_staffs テーブルにデータを保存
+            for staff_id in staff_ids:
                 relation = RelationOfEventAndStaff(
                     event_id=new_event.id,
                     staff_id=staff_id
                 )
                 self.db.add(relation)
 
-        self.db.commit()
+            # 日次集計にも同じトランザクションで加算する
+            self.stats.apply(booking_contribution(
+                store_id, new_event.from_at, new_event.duration_by_minutes, new_event.status, staff_ids
+            ))
+
+            # スタッフの行ロックを保持したまま、イベントとリレーションを1トランザクションでコミット
+            self.store_service.bump_change_version(store_id, "bookings")
+            reservation.bump()
+            self.db.commit()
+            reservation.record(new_event.id)
+
+        self.db.refresh(new_event)
+        self._publish(store_id, "created", new_event)
         return new_event
 
+    def create_events_bulk(self, store_id: int, items: List[EventCreateSchema]) -> List[EventBulkResultSchema]:
+        """
+        複数の予約を1トランザクションで作成します（既存の予約帳の移行用）。
+        不正な項目や重複する項目はスキップし、項目ごとの結果を返します。
+        """
+        if len(items) > settings.BULK_BOOKING_MAX_ITEMS:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Too many items (max {settings.BULK_BOOKING_MAX_ITEMS})"
+            )
+
+        valid = [i for i, data in enumerate(items) if data.from_at < data.to_at]
+        batch = [(items[i].staff_ids or [], items[i].from_at, items[i].to_at, items[i].status == EventStatusEnum.active)
+                 for i in valid]
+        results = [EventBulkResultSchema(index=i, status="failed", detail="from_at must be earlier than to_at")
+                   for i in range(len(items))]
+
+        with schedule_index.reserve_batch(self.db, store_id, batch) as reservation:
+            accepted = {}
+            for position, error in enumerate(reservation.errors):
+                i = valid[position]
+                if error is not None:
+                    results[i].detail = error
+                    continue
+                data = items[i]
+                accepted[position] = Event(
+                    store_id=store_id,
+                    customer_id=data.customer_id,
+                    duration_by_minutes=int((data.to_at - data.from_at).total_seconds() / 60),
+                    from_at=data.from_at,
+                    to_at=data.to_at,
+                    note=data.note,
+                    details={"overview": data.details.overview},
+                    status=data.status,
+                    title=data.title,
+                )
+
+            if accepted:
+                # イベントはまとめてフラッシュし、リレーションは1回の executemany で挿入する
+                self.db.add_all(accepted.values())
+                self.db.flush()
+                relations = [
+                    {"event_id": event.id, "staff_id": staff_id}
+                    for position, event in accepted.items()
+                    for staff_id in dict.fromkeys(items[valid[position]].staff_ids or [])
+                ]
+                if relations:
+                    self.db.execute(insert(RelationOfEventAndStaff), relations)
+
+                deltas = None
+                for position, event in accepted.items():
+                    deltas = booking_contribution(
+                        store_id, event.from_at, event.duration_by_minutes, event.status,
+                        dict.fromkeys(items[valid[position]].staff_ids or []), deltas=deltas
+                    )
+                self.stats.apply(deltas)
+                self.store_service.bump_change_version(store_id, "bookings")
+            reservation.bump()
+            self.db.commit()
+            reservation.record({position: event.id for position, event in accepted.items()})
+
+        for position, event in accepted.items():
+            result = results[valid[position]]
+            result.status = "created"
+            result.id = event.id
+            result.detail = None
+        if accepted and booking_events.has_subscribers(store_id):
+            # 大量の予約を個別に送らず、作成されたIDだけを通知する
+            booking_events.publish(store_id, {"type": "bulk_created", "ids": [event.id for event in accepted.values()]})
+        return results
+
     def get_event(self, store_id: int, event_id: int):
-        event = self.db.query(Event).filter(Event.store_id == store_id, Event.id == event_id).first()
+        event = self.db.query(Event)\
+            .options(*EVENT_RESPONSE_LOAD_OPTIONS)\
+            .filter(Event.store_id == store_id, Event.id == event_id)\
+            .first()
         if not event:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Event not found")
         return event
 
+    def _lock_event(self, store_id: int, event_id: int):
+        """
+        変更・削除する予約の行をロックし、(予約の行, 担当スタッフのID) を返します。
+
+        MySQL の REPEATABLE READ では、トランザクションで最初に行ったロックなしの SELECT の時点でスナップショットが固定されます。
+        ロック付きの読み取りはスナップショットを作らないため、スタッフの行ロック（schedule_index.reserve）を取るまでは
+        これ以外の読み取りを行わないでください。ロック前にスナップショットが作られると、その後に他のワーカーがコミットした
+        予約がバケットの読み込みで見えず、重複した予約を受け付けてしまいます。
+        """
+        event = self.db.query(Event.id, Event.from_at, Event.to_at, Event.status)\
+            .filter(Event.store_id == store_id, Event.id == event_id)\
+            .with_for_update()\
+            .first()
+        if not event:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Event not found")
+        staff_ids = [
+            staff_id for staff_id, in self.db.query(RelationOfEventAndStaff.staff_id)
+            .filter(RelationOfEventAndStaff.event_id == event_id)
+            .with_for_update()
+        ]
+        return event, staff_ids
+
     def update_event(self, store_id: int, event_id: int, event_data: EventUpdateSchema):
-        event = self.get_event(store_id, event_id)
-        for key, value in event_data.dict().items():
-            setattr(event, key, value)
-        self.db.commit()
+        locked, staff_ids = self._lock_event(store_id, event_id)
+        # 指定されなかった項目は更新しない
+        values = event_data.dict(exclude_unset=True)
+        from_at = naive(values.get("from_at") or locked.from_at)
+        to_at = naive(values.get("to_at") or locked.to_at)
+        if from_at >= to_at:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="from_at must be earlier than to_at")
+        active = (values.get("status") or locked.status) == EventStatusEnum.active
+
+        # 変更後の時間帯が他の予約と重複しないか確認し、インデックス上の区間を置き換える
+        with schedule_index.reserve(self.db, store_id, staff_ids, from_at, to_at, exclude_event_id=event_id,
+                                    previous=(locked.from_at, locked.to_at), active=active) as reservation:
+            # スタッフの行ロックを取った後で読み込む
+            event = self.get_event(store_id, event_id)
+            # 更新前の寄与を取り消してから、更新後の寄与を加算する
+            deltas = booking_contribution(
+                store_id, event.from_at, event.duration_by_minutes, event.status, staff_ids, sign=-1
+            )
+            for key, value in values.items():
+                setattr(event, key, value)
+            event.duration_by_minutes = int((to_at - from_at).total_seconds() / 60)
+            self.stats.apply(booking_contribution(
+                store_id, event.from_at, event.duration_by_minutes, event.status, staff_ids, deltas=deltas
+            ))
+            self.store_service.bump_change_version(store_id, "bookings")
+            reservation.bump()
+            self.db.commit()
+            reservation.record(event.id)
+
         self.db.refresh(event)
+        self._publish(store_id, "updated", event)
         return event
 
     def delete_event(self, store_id: int, event_id: int):
-        event = self.get_event(store_id, event_id)
-        self.db.delete(event)
-        self.db.commit()
+        locked, staff_ids = self._lock_event(store_id, event_id)
+
+        # 作成・更新と同じロックを取り、コミット後にインデックスから区間を取り除く（枠は占有しないため active=False）
+        with schedule_index.reserve(self.db, store_id, staff_ids, locked.from_at, locked.to_at, exclude_event_id=event_id,
+                                    previous=(locked.from_at, locked.to_at), active=False) as reservation:
+            event = self.get_event(store_id, event_id)
+            self.stats.apply(booking_contribution(
+                store_id, event.from_at, event.duration_by_minutes, event.status, staff_ids, sign=-1
+            ))
+            self.db.delete(event)
+            self.store_service.bump_change_version(store_id, "bookings")
+            # 他のワーカーが持つ予約インデックスを無効化する
+            reservation.bump()
+            self.db.commit()
+            reservation.record(event_id)
+        if booking_events.has_subscribers(store_id):
+            booking_events.publish(store_id, {"type": "deleted", "id": event_id})
         return {"detail": "Event deleted"}
 
+    def _publish(self, store_id: int, change_type: str, event: Event):
+        # コミット済みの変更を、予約ストリームの購読者に配信する
+        if booking_events.has_subscribers(store_id):
+            booking_events.publish(store_id, {
+                "type": change_type,
+                "booking": jsonable_encoder(EventResponseSchema.from_orm(event)),
+            })
+
     def get_event_with_staff(self, store_id: int, event_id: int):
         event = self.db.query(Event)\
             .options(joinedload(Event.staffs).joinedload(Staff.staff_attributes))\
@@ -81,6 +298,89 @@ class EventService:
         event_response = EventResponseSchema.from_orm(event)
         return event_response
 
+class AsyncEventService:
+    """
+    EventService の非同期版です。予約の取得は AsyncSession で行います。
+
+    作成・更新・削除は、予約インデックスのスレッドロックを保持したままDBを操作します。
+    イベントループ上でこのロックを待つとループ全体が止まるため、書き込みは同期版の EventService を
+    専用のセッションでスレッドプールに渡して実行し、レスポンス用のスキーマに変換してから返します。
+    """
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def get_events(
+        self,
+        store_id: int,
+        from_at: Optional[datetime] = None,
+        to_at: Optional[datetime] = None,
+        staff_id: Optional[int] = None,
+        status: Optional[EventStatusEnum] = None,
+        cursor: Optional[Tuple[datetime, int]] = None,
+        limit: Optional[int] = None,
+    ):
+        # 条件は EventService.get_events と同じ
+        stmt = select(Event).options(*EVENT_RESPONSE_LOAD_OPTIONS).where(Event.store_id == store_id)
+        if from_at is not None:
+            stmt = stmt.where(Event.from_at >= from_at)
+        if to_at is not None:
+            stmt = stmt.where(Event.from_at < to_at)
+        if status is not None:
+            stmt = stmt.where(Event.status == status.value)
+        if staff_id is not None:
+            stmt = stmt.join(RelationOfEventAndStaff, RelationOfEventAndStaff.event_id == Event.id)\
+                .where(RelationOfEventAndStaff.staff_id == staff_id)
+        if cursor is not None:
+            cursor_from_at, cursor_id = cursor
+            stmt = stmt.where(or_(
+                Event.from_at > cursor_from_at,
+                and_(Event.from_at == cursor_from_at, Event.id > cursor_id),
+            ))
+        stmt = stmt.order_by(Event.from_at, Event.id)
+        if limit is not None:
+            stmt = stmt.limit(limit + 1)
+        result = await self.db.execute(stmt)
+        return result.scalars().all()
+
+    async def get_event(self, store_id: int, event_id: int):
+        result = await self.db.execute(
+            select(Event).options(*EVENT_RESPONSE_LOAD_OPTIONS)
+            .where(Event.store_id == store_id, Event.id == event_id)
+        )
+        event = result.scalars().first()
+        if not event:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Event not found")
+        return event
+
+    @staticmethod
+    async def _run_sync(operation):
+        def run():
+            db = SessionLocal()
+            try:
+                return operation(EventService(db))
+            finally:
+                db.close()
+        return await run_in_threadpool(run)
+
+    async def create_event(self, store_id: int, data: EventCreateSchema) -> EventResponseSchema:
+        return await self._run_sync(
+            lambda service: EventResponseSchema.from_orm(service.create_event(store_id, data))
+        )
+
+    async def create_events_bulk(self, store_id: int, items: List[EventCreateSchema]) -> List[EventBulkResultSchema]:
+        return await self._run_sync(lambda service: service.create_events_bulk(store_id, items))
+
+    async def update_event(self, store_id: int, event_id: int, event_data: EventUpdateSchema) -> EventResponseSchema:
+        return await self._run_sync(
+            lambda service: EventResponseSchema.from_orm(service.update_event(store_id, event_id, event_data))
+        )
+
+    async def delete_event(self, store_id: int, event_id: int):
+        return await self._run_sync(lambda service: service.delete_event(store_id, event_id))
+
 # この関数を使って `EventService` の依存関係を解決します
 def get_event_service(db: Session = Depends(get_db)) -> EventService:
-    return EventService(db)
\ No newline at end of file
+    return EventService(db)
+
+def get_async_event_service(db: AsyncSession = Depends(get_async_db)) -> AsyncEventService:
+    return AsyncEventService(db)
\ No newline at end of file
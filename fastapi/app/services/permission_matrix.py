@@ -0,0 +1,93 @@
+# backend/app/services/permission_matrix.py
+import threading
+import time
+from typing import Dict, Iterable, Optional, Tuple
+from sqlalchemy import select
+from app.core.config import settings
+from app.db.database import SessionLocal
+from app.models.permission import Permission
+from app.models.relation_of_role_and_permission import RelationOfRoleAndPermission
+from app.models.role import Role
+
+# Permission.function の各値に1ビットずつ割り当てる
+PERMISSION_BITS: Dict[str, int] = {
+    function: 1 << bit for bit, function in enumerate(Permission.__table__.c.function.type.enums)
+}
+
+
+def permission_mask(permissions: Iterable[str]) -> int:
+    """
+    権限名の一覧をビットマスクに変換します。未知の権限名は ValueError になります。
+    """
+    mask = 0
+    for permission in permissions:
+        if permission not in PERMISSION_BITS:
+            raise ValueError(f"Unknown permission: {permission}")
+        mask |= PERMISSION_BITS[permission]
+    return mask
+
+
+class PermissionMatrix:
+    """
+    roles / permissions / relations_of_role_and_permission から、ロールごとの権限ビットマスクと
+    ロール名をまとめてコンパイルし、プロセス全体でキャッシュします。
+    キャッシュが有効な間、権限チェックは整数の AND だけで済み、DBへのクエリは発生しません。
+
+    ロールの変更時は invalidate() で破棄します。他のワーカーでの変更は ttl 秒（PERMISSION_MATRIX_TTL_SECONDS、10秒以下）以内に反映され、
+    それまでは剥奪した権限も有効なまま残ります。
+    """
+    def __init__(self, ttl: int):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        # (ロールID -> 権限ビットマスク, ロールID -> ロール名, コンパイルした時刻)
+        self._snapshot: Optional[Tuple[Dict[int, int], Dict[int, str], float]] = None
+
+    def _compile(self) -> Tuple[Dict[int, int], Dict[int, str], float]:
+        # 全ロールの権限を1回のクエリで取得する。権限の無いロールもマスク 0 として含める
+        stmt = select(Role.id, Role.name, Permission.function)\
+            .select_from(Role)\
+            .outerjoin(RelationOfRoleAndPermission, RelationOfRoleAndPermission.role_id == Role.id)\
+            .outerjoin(Permission, Permission.id == RelationOfRoleAndPermission.permission_id)
+        masks: Dict[int, int] = {}
+        names: Dict[int, str] = {}
+        db = SessionLocal()
+        try:
+            for role_id, name, function in db.execute(stmt):
+                names[role_id] = name
+                masks[role_id] = masks.get(role_id, 0) | PERMISSION_BITS.get(function, 0)
+        finally:
+            db.close()
+        return masks, names, time.monotonic()
+
+    def _expired(self, snapshot) -> bool:
+        return snapshot is None or time.monotonic() - snapshot[2] > self.ttl
+
+    def _get(self) -> Tuple[Dict[int, int], Dict[int, str]]:
+        # 権限の無いロールも含めて全ロールをコンパイルしているため、スナップショットに無いロール
+        # （削除済みなど）は権限なしとして扱い、作り直すのは ttl が切れたときか invalidate() の後だけにする
+        snapshot = self._snapshot
+        if self._expired(snapshot):
+            with self._lock:
+                # 他のスレッドが待っている間に作り直していれば、それを使う
+                snapshot = self._snapshot
+                if self._expired(snapshot):
+                    snapshot = self._snapshot = self._compile()
+        return snapshot[0], snapshot[1]
+
+    def mask_for_role(self, role_id: int) -> int:
+        masks, _ = self._get()
+        return masks.get(role_id, 0)
+
+    def role_name(self, role_id: int) -> Optional[str]:
+        _, names = self._get()
+        return names.get(role_id)
+
+    def has_permissions(self, role_id: int, required_mask: int) -> bool:
+        return self.mask_for_role(role_id) & required_mask == required_mask
+
+    def invalidate(self):
+        self._snapshot = None
+
+
+# プロセス全体で共有する権限マトリクス
+permission_matrix = PermissionMatrix(ttl=settings.PERMISSION_MATRIX_TTL_SECONDS)
@@ -0,0 +1,85 @@
+# backend/app/services/principal_cache.py
+import threading
+from typing import NamedTuple, Optional
+from cachetools import TTLCache
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.models.staff import Staff
+from app.models.staff_attribute import StaffAttribute
+from app.services.permission_matrix import permission_matrix
+
+
+class Principal(NamedTuple):
+    """
+    認証済みスタッフを表す不変のオブジェクトです。permissions はロールの権限ビットマスクです。
+    """
+    staff_id: int
+    store_id: int
+    role_id: int
+    permissions: int
+
+
+class PrincipalCache:
+    """
+    トークンの subject をキーに Principal を TTL + LRU でキャッシュします。
+    スタッフやロールが更新・削除されたときは invalidate_staff() / invalidate_all() で破棄します。
+
+    破棄は変更を処理したワーカーにしか届きません。他のワーカーでは、削除されたスタッフやロールの変更前の権限が
+    最大で ttl 秒（PRINCIPAL_CACHE_TTL_SECONDS、10秒以下）と、PermissionMatrix の ttl の合計まで有効なまま残ります。
+    """
+    def __init__(self, maxsize: int, ttl: int):
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._lock = threading.Lock()
+        # 破棄のたびに加算する。読み込み中に破棄された結果をキャッシュしないために使う
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, subject: str) -> Optional[Principal]:
+        with self._lock:
+            principal = self._cache.get(subject)
+            if principal is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return principal
+
+    def load(self, db: Session, subject: str, email: Optional[str] = None) -> Optional[Principal]:
+        """
+        スタッフを1回のクエリで読み込み、キャッシュしてから返します。見つからない場合はキャッシュしません。
+        """
+        with self._lock:
+            generation = self._generation
+        row = db.query(Staff.id, Staff.store_id, Staff.role_id)\
+            .join(StaffAttribute, StaffAttribute.staff_id == Staff.id)\
+            .filter(StaffAttribute.mail_address == (email or subject))\
+            .first()
+        if row is None:
+            return None
+        principal = Principal(row.id, row.store_id, row.role_id, permission_matrix.mask_for_role(row.role_id))
+        with self._lock:
+            if generation == self._generation:
+                self._cache[subject] = principal
+        return principal
+
+    def invalidate_staff(self, staff_id: int):
+        with self._lock:
+            self._generation += 1
+            for subject in [key for key, principal in self._cache.items() if principal.staff_id == staff_id]:
+                del self._cache[subject]
+
+    def stats(self) -> dict:
+        """
+        キャッシュのヒット数・ミス数と現在のエントリ数を返します。
+        """
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "size": self._cache.currsize}
+
+    def invalidate_all(self):
+        with self._lock:
+            self._generation += 1
+            self._cache.clear()
+
+
+# プロセス全体で共有するキャッシュ
+principal_cache = PrincipalCache(maxsize=settings.PRINCIPAL_CACHE_MAXSIZE, ttl=settings.PRINCIPAL_CACHE_TTL_SECONDS)
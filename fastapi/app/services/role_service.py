@@ -2,6 +2,8 @@ from sqlalchemy.orm import Session
 from app.models.role import Role
 from app.schemas.role import RoleCreateSchema
 from app.db.database import get_db
+from app.services.permission_matrix import permission_matrix
+from app.services.principal_cache import principal_cache
 from fastapi import Depends
 
 class RoleService:
@@ -12,6 +14,9 @@ class RoleService:
         new_role = Role(store_id=store_id, **data.dict())
         self.db.add(new_role)
         self.db.commit()
+        # コンパイル済みの権限マトリクスを作り直させる
+        permission_matrix.invalidate()
+        principal_cache.invalidate_all()
         self.db.refresh(new_role)
         return new_role
 
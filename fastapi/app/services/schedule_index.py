@@ -0,0 +1,342 @@
+# backend/app/services/schedule_index.py
+import threading
+from bisect import bisect_left, bisect_right
+from contextlib import contextmanager
+from datetime import date, datetime, time, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from cachetools import LRUCache
+from fastapi import HTTPException, status
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.event import Event
+from app.models.relation_of_event_and_staff import RelationOfEventAndStaff
+from app.models.staff import Staff
+
+# 日をまたぐ予約を拾うために、検索範囲の開始をどこまで遡るか。
+# 1日を超える長さの予約は想定していない。
+MAX_EVENT_SPAN = timedelta(days=1)
+
+BucketKey = Tuple[int, int, date]  # (store_id, staff_id, 日付)
+
+
+def naive(value: datetime) -> datetime:
+    # DBから返る日時はタイムゾーン情報を持たないため、比較できるように揃える
+    return value.replace(tzinfo=None) if value.tzinfo else value
+
+
+def _days(from_at: datetime, to_at: datetime) -> List[date]:
+    # [from_at, to_at) が掛かる日付の一覧を返す
+    first = from_at.date()
+    last = (to_at - timedelta(microseconds=1)).date()
+    return [first + timedelta(days=i) for i in range((last - first).days + 1)]
+
+
+class _DayBucket:
+    """
+    1スタッフ・1日分の予約区間を開始日時順に保持します。
+    max_ends[i] は ends[0..i] の最大値で、重複判定を二分探索で行うために使います。
+    """
+    __slots__ = ("version", "starts", "ends", "event_ids", "max_ends")
+
+    def __init__(self, version: int):
+        self.version = version
+        self.starts: List[datetime] = []
+        self.ends: List[datetime] = []
+        self.event_ids: List[int] = []
+        self.max_ends: List[datetime] = []
+
+    def insert(self, event_id: int, from_at: datetime, to_at: datetime):
+        i = bisect_right(self.starts, from_at)
+        self.starts.insert(i, from_at)
+        self.ends.insert(i, to_at)
+        self.event_ids.insert(i, event_id)
+        self.max_ends.insert(i, to_at)
+        self._rebuild_max_ends(i)
+
+    def remove(self, event_id: int):
+        if event_id not in self.event_ids:
+            return
+        i = self.event_ids.index(event_id)
+        del self.starts[i], self.ends[i], self.event_ids[i], self.max_ends[i]
+        self._rebuild_max_ends(i)
+
+    def _rebuild_max_ends(self, start: int):
+        current = self.max_ends[start - 1] if start > 0 else None
+        for j in range(start, len(self.ends)):
+            current = self.ends[j] if current is None or self.ends[j] > current else current
+            self.max_ends[j] = current
+
+    def overlapping(self, from_at: datetime, to_at: datetime, exclude_event_id: Optional[int] = None) -> List[int]:
+        # 開始日時が to_at より前の区間のうち、終了日時が from_at より後のものが重複
+        i = bisect_left(self.starts, to_at)
+        conflicts = []
+        j = i - 1
+        while j >= 0 and self.max_ends[j] > from_at:
+            if self.ends[j] > from_at and self.event_ids[j] != exclude_event_id:
+                conflicts.append(self.event_ids[j])
+            j -= 1
+        return conflicts
+
+
+class Reservation:
+    """
+    StaffScheduleIndex.reserve() が返す予約枠。
+    呼び出し側は同じトランザクション内で bump() し、コミット後に record() します。
+    """
+    def __init__(self, index: "StaffScheduleIndex", db: Session, store_id: int, staff_ids: List[int],
+                 from_at: datetime, to_at: datetime, versions: Dict[int, int], previous_keys: List[BucketKey],
+                 active: bool):
+        self.index = index
+        self.db = db
+        self.store_id = store_id
+        self.staff_ids = staff_ids
+        self.from_at = from_at
+        self.to_at = to_at
+        self.versions = versions
+        self.previous_keys = previous_keys
+        self.active = active
+
+    def bump(self):
+        """
+        スタッフのスケジュールバージョンを進めます。他のワーカーはこの値の変化でキャッシュを読み直します。
+        """
+        self.index.bump_versions(self.db, self.staff_ids)
+        self.versions = {staff_id: version + 1 for staff_id, version in self.versions.items()}
+
+    def record(self, event_id: int):
+        """
+        コミット済みの予約をインデックスに反映します。
+        """
+        self.index.record(self, event_id)
+
+
+class BatchReservation:
+    """
+    StaffScheduleIndex.reserve_batch() が返す予約枠。errors[i] が None の項目のみ登録できます。
+    """
+    def __init__(self, index: "StaffScheduleIndex", db: Session, store_id: int,
+                 items: List[Tuple[List[int], datetime, datetime, bool]], versions: Dict[int, int],
+                 errors: List[Optional[str]]):
+        self.index = index
+        self.db = db
+        self.store_id = store_id
+        self.items = items
+        self.versions = versions
+        self.errors = errors
+
+    def bump(self):
+        staff_ids = sorted({staff_id for (staff_ids, _, _, _), error in zip(self.items, self.errors)
+                            if error is None for staff_id in staff_ids})
+        self.index.bump_versions(self.db, staff_ids)
+        self.versions = {staff_id: version + 1 if staff_id in staff_ids else version
+                         for staff_id, version in self.versions.items()}
+
+    def record(self, event_ids: Dict[int, int]):
+        """
+        コミット済みの予約をインデックスに反映します。event_ids は 項目番号 -> イベントID です。
+        """
+        for i, event_id in event_ids.items():
+            staff_ids, from_at, to_at, active = self.items[i]
+            if active:
+                self.index.record(Reservation(self.index, self.db, self.store_id, staff_ids, from_at, to_at,
+                                              self.versions, [], active), event_id)
+
+
+class StaffScheduleIndex:
+    """
+    店舗・スタッフ・日付ごとの予約区間インデックス（ワーカープロセス単位）。
+
+    - 重複判定は1バケットあたり O(log n + k)。k は開始日時が to_at より前で、max_ends が from_at を超える区間の数です。
+      追加・削除はリストの挿入と max_ends の再計算で O(n) ですが、n は1スタッフ・1日分の予約数です。
+    - 同一プロセス内の同時書き込みは (スタッフ, 日付) をキーにしたロックストライプで直列化します。
+    - プロセス間の整合性は staffs 行の SELECT ... FOR UPDATE と staffs.schedule_version で保証します。
+      キャッシュしたバケットのバージョンがDBの値と異なる場合のみ、そのバケットをDBから読み直します。
+    """
+    def __init__(self, stripes: int, max_buckets: int):
+        self._stripes = [threading.Lock() for _ in range(stripes)]
+        self._buckets: LRUCache = LRUCache(maxsize=max_buckets)
+        # LRUCache 自体はスレッドセーフではないため、参照・更新時のみ保護する
+        self._buckets_lock = threading.Lock()
+
+    def _keys(self, store_id: int, staff_ids: Iterable[int], from_at: datetime, to_at: datetime) -> List[BucketKey]:
+        return [(store_id, staff_id, day) for staff_id in staff_ids for day in _days(from_at, to_at)]
+
+    def _get(self, key: BucketKey) -> Optional[_DayBucket]:
+        with self._buckets_lock:
+            return self._buckets.get(key)
+
+    def _set(self, key: BucketKey, bucket: _DayBucket):
+        with self._buckets_lock:
+            self._buckets[key] = bucket
+
+    @contextmanager
+    def _locked(self, keys: List[BucketKey]):
+        # デッドロックを避けるため、ストライプは常に番号順に取得する
+        stripe_ids = sorted({hash(key[1:]) % len(self._stripes) for key in keys})
+        for stripe_id in stripe_ids:
+            self._stripes[stripe_id].acquire()
+        try:
+            yield
+        finally:
+            for stripe_id in reversed(stripe_ids):
+                self._stripes[stripe_id].release()
+
+    @contextmanager
+    def reserve(self, db: Session, store_id: int, staff_ids: List[int], from_at: datetime, to_at: datetime,
+                exclude_event_id: Optional[int] = None, previous: Optional[Tuple[datetime, datetime]] = None,
+                active: bool = True):
+        """
+        指定スタッフの [from_at, to_at) を確保します。重複があれば 409 を返します。
+        既存の予約を変更する場合は exclude_event_id と変更前の区間 previous を渡します。
+        キャンセル済みの予約（active=False）は枠を占有しないため、重複チェックを行いません。
+        予約を削除する場合も active=False とし、previous に削除する予約の区間を渡します。
+        ブロックを抜けるまでロックを保持するため、呼び出し側はブロック内でコミットしてください。
+        同じトランザクションで、これより前にロックなしの SELECT を行わないでください（REPEATABLE READ の
+        スナップショットがロックより前に固定され、他のワーカーが直前にコミットした予約をバケットに読み込めなくなるため）。
+        """
+        from_at, to_at = naive(from_at), naive(to_at)
+        staff_ids = sorted(set(staff_ids))
+        keys = self._keys(store_id, staff_ids, from_at, to_at)
+        previous_keys = self._keys(store_id, staff_ids, naive(previous[0]), naive(previous[1])) if previous else []
+        with self._locked(keys + previous_keys):
+            versions = self._lock_staffs(db, store_id, staff_ids)
+            missing = [staff_id for staff_id in staff_ids if staff_id not in versions]
+            if missing:
+                raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Staff not found: {missing}")
+
+            buckets = self._fresh_buckets(db, store_id, keys, versions) if active else {}
+            for key, bucket in buckets.items():
+                conflicts = bucket.overlapping(from_at, to_at, exclude_event_id)
+                if conflicts:
+                    raise HTTPException(
+                        status_code=status.HTTP_409_CONFLICT,
+                        detail=f"Staff {key[1]} is already booked for this time (event {conflicts[0]})"
+                    )
+
+            yield Reservation(self, db, store_id, staff_ids, from_at, to_at, versions, previous_keys, active)
+
+    @contextmanager
+    def reserve_batch(self, db: Session, store_id: int, items: List[Tuple[List[int], datetime, datetime, bool]]):
+        """
+        複数の予約 (staff_ids, from_at, to_at, active) をまとめて確保します。
+        既存の予約やバッチ内の先行する予約と重複するものは例外にせず、BatchReservation.errors に理由を記録します。
+        """
+        items = [(sorted(set(staff_ids)), naive(from_at), naive(to_at), active)
+                 for staff_ids, from_at, to_at, active in items]
+        all_keys = sorted({key for staff_ids, from_at, to_at, active in items
+                           for key in self._keys(store_id, staff_ids, from_at, to_at)})
+        all_staff_ids = sorted({staff_id for staff_ids, _, _, _ in items for staff_id in staff_ids})
+        with self._locked(all_keys):
+            versions = self._lock_staffs(db, store_id, all_staff_ids)
+            active_keys = sorted({key for staff_ids, from_at, to_at, active in items if active
+                                  for key in self._keys(store_id, [s for s in staff_ids if s in versions], from_at, to_at)})
+            buckets = self._fresh_buckets(db, store_id, active_keys, versions) if active_keys else {}
+            # このバッチで受け付けた予約（まだDBには無い）。IDの代わりに -(項目番号 + 1) を入れておく
+            pending: Dict[BucketKey, _DayBucket] = {}
+            errors: List[Optional[str]] = []
+            for i, (staff_ids, from_at, to_at, active) in enumerate(items):
+                errors.append(self._check_batch_item(store_id, staff_ids, from_at, to_at, active, versions, buckets, pending))
+                if errors[i] is None and active:
+                    for key in self._keys(store_id, staff_ids, from_at, to_at):
+                        pending.setdefault(key, _DayBucket(versions[key[1]])).insert(-(i + 1), from_at, to_at)
+
+            yield BatchReservation(self, db, store_id, items, versions, errors)
+
+    def _check_batch_item(self, store_id, staff_ids, from_at, to_at, active, versions, buckets, pending) -> Optional[str]:
+        missing = [staff_id for staff_id in staff_ids if staff_id not in versions]
+        if missing:
+            return f"Staff not found: {missing}"
+        if not active:
+            return None
+        for key in self._keys(store_id, staff_ids, from_at, to_at):
+            conflicts = buckets[key].overlapping(from_at, to_at)
+            if conflicts:
+                return f"Staff {key[1]} is already booked for this time (event {conflicts[0]})"
+            if key in pending:
+                conflicts = pending[key].overlapping(from_at, to_at)
+                if conflicts:
+                    return f"Staff {key[1]} is already booked for this time (item {-conflicts[0] - 1})"
+        return None
+
+    def _lock_staffs(self, db: Session, store_id: int, staff_ids: List[int]) -> Dict[int, int]:
+        # 行ロックで他ワーカーからの同じスタッフへの書き込みを直列化し、各スタッフのバージョンを返す
+        if not staff_ids:
+            return {}
+        return dict(
+            db.query(Staff.id, Staff.schedule_version)
+            .filter(Staff.store_id == store_id, Staff.id.in_(staff_ids))
+            .with_for_update()
+            .all()
+        )
+
+    def _fresh_buckets(self, db: Session, store_id: int, keys: List[BucketKey],
+                       versions: Dict[int, int]) -> Dict[BucketKey, _DayBucket]:
+        # キャッシュが無いか、DB上のバージョンと異なるバケットだけを読み直す
+        buckets = {key: self._get(key) for key in keys}
+        stale = [key for key, bucket in buckets.items() if bucket is None or bucket.version != versions[key[1]]]
+        if stale:
+            buckets.update(self._load(db, store_id, stale, versions))
+        return buckets
+
+    def _load(self, db: Session, store_id: int, keys: List[BucketKey], versions: Dict[int, int]) -> Dict[BucketKey, _DayBucket]:
+        # 対象スタッフ・日付の有効な予約を1クエリで取得し、バケットを作り直す
+        staff_ids = sorted({key[1] for key in keys})
+        days = sorted({key[2] for key in keys})
+        window_start = datetime.combine(days[0], time.min)
+        window_end = datetime.combine(days[-1] + timedelta(days=1), time.min)
+        rows = (
+            db.query(RelationOfEventAndStaff.staff_id, Event.id, Event.from_at, Event.to_at)
+            .join(Event, Event.id == RelationOfEventAndStaff.event_id)
+            .filter(
+                Event.store_id == store_id,
+                Event.from_at >= window_start - MAX_EVENT_SPAN,
+                Event.from_at < window_end,
+                Event.to_at > window_start,
+                Event.status == 'active',
+                RelationOfEventAndStaff.staff_id.in_(staff_ids),
+            )
+            .all()
+        )
+        buckets = {key: _DayBucket(versions[key[1]]) for key in keys}
+        for staff_id, event_id, from_at, to_at in rows:
+            from_at, to_at = naive(from_at), naive(to_at)
+            for day in _days(from_at, to_at):
+                bucket = buckets.get((store_id, staff_id, day))
+                if bucket is not None:
+                    bucket.insert(event_id, from_at, to_at)
+        for key, bucket in buckets.items():
+            self._set(key, bucket)
+        return buckets
+
+    def bump_versions(self, db: Session, staff_ids: List[int]):
+        if staff_ids:
+            db.query(Staff).filter(Staff.id.in_(staff_ids))\
+                .update({Staff.schedule_version: Staff.schedule_version + 1}, synchronize_session=False)
+
+    def record(self, reservation: Reservation, event_id: int):
+        # reserve() のロックを保持した状態で呼ばれる
+        self._discard(reservation.previous_keys, event_id)
+        if not reservation.active:
+            return
+        for key in self._keys(reservation.store_id, reservation.staff_ids, reservation.from_at, reservation.to_at):
+            bucket = self._get(key)
+            if bucket is None:
+                continue
+            bucket.remove(event_id)
+            bucket.insert(event_id, reservation.from_at, reservation.to_at)
+            bucket.version = reservation.versions[key[1]]
+
+    def _discard(self, keys: List[BucketKey], event_id: int):
+        for key in keys:
+            bucket = self._get(key)
+            if bucket is not None:
+                bucket.remove(event_id)
+
+
+# プロセス全体で共有するインデックス
+schedule_index = StaffScheduleIndex(
+    stripes=settings.BOOKING_LOCK_STRIPES,
+    max_buckets=settings.SCHEDULE_INDEX_MAX_BUCKETS,
+)
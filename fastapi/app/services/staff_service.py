@@ -1,149 +1,120 @@
 # backend/app/services/staff_service.py
 
 import logging
-from sqlalchemy.orm import Session
-from app.repositories.staff_repository import StaffRepository
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
 from app.models.staff import Staff
 from app.models.staff_attribute import StaffAttribute
 from app.models.role import Role
-from typing import List
-from app.db.database import get_db
-from fastapi import Depends, HTTPException
-from app.services.auth_service import AuthService
+from typing import List, Optional
+from app.db.database import get_async_db
+from fastapi import Depends
+from app.services.principal_cache import principal_cache
+from app.services.store_service import AsyncStoreService
+from app.core.passwords import password_hasher
 from app.schemas.staff import StaffCreateSchema, StaffAttributeResponseSchema, StaffResponseSchema
-from jose import jwt, JWTError
-from app.core.config import settings
 
 # ログの設定
 logger = logging.getLogger(__name__)
 
-class StaffService:
-    def __init__(self, db: Session):
+class AsyncStaffService:
+    """
+    スタッフを扱うサービスです。非同期では遅延読み込みができないため、スタッフ属性は必要な箇所でまとめて読み込みます。
+    """
+    def __init__(self, db: AsyncSession):
         self.db = db
-        self.repository = StaffRepository()
-        self.auth_service = AuthService(db)
 
-    def get_staff_by_supabase_id(self, supabase_id: str) -> Staff:
-        logger.debug(f"Getting staff by Supabase ID: {supabase_id}")
-        staff = self.db.query(Staff).filter(Staff.email == supabase_id).first()
-        logger.debug(f"Staff found: {staff}")
-        return staff
-
-    def get_role(self, role_id: int) -> Role:
-        """
-        role_id に基づいて Role オブジェクトを取得します。
-        """
-        return self.db.query(Role).filter(Role.id == role_id).first()
+    async def get_role(self, role_id: int) -> Role:
+        return await self.db.get(Role, role_id)
 
-    def create_staff(self, store_id: int, data: StaffCreateSchema) -> Staff:
-        """
-        新しいスタッフを作成し、DBに保存します。
-        """
-        hashed_password = self.auth_service.get_password_hash(data.password)
+    async def create_staff(self, store_id: int, data: StaffCreateSchema) -> Staff:
+        # bcrypt は専用のハッシュ化プールで実行する
+        hashed_password = await password_hasher.hash(data.password)
 
         new_staff = Staff(store_id=store_id, role_id=data.role_id)
         self.db.add(new_staff)
-        self.db.commit()
-        self.db.refresh(new_staff)
-
-        # StaffAttribute オブジェクトを Staff に関連付けて作成する
-        staff_attribute = StaffAttribute(
+        await self.db.flush()
+        self.db.add(StaffAttribute(
             staff_id=new_staff.id,
             name=data.staff_attributes.name,
             name_ruby=data.staff_attributes.name_ruby,
             mail_address=data.staff_attributes.mail_address,
             hashed_password=hashed_password
+        ))
+        await self.db.commit()
+        result = await self.db.execute(
+            select(Staff).options(selectinload(Staff.staff_attributes))
+            .where(Staff.id == new_staff.id)
+            .execution_options(populate_existing=True)
         )
-        self.db.add(staff_attribute)
-        self.db.commit()
-        self.db.refresh(staff_attribute)
-
-        return new_staff
-
-    def create_staff_from_supabase(self, supabase_staff: dict) -> Staff:
-        logger.debug(f"Creating staff from Supabase data: {supabase_staff}")
-        staff_data = {
-            'supabase_id': supabase_staff['sub'],
-            'name': supabase_staff.get('user_metadata', {}).get('full_name', ''),
-            'email': supabase_staff['email'],
-        }
-        return self.create_staff(staff_data)
-
-    def get_my_account(self, store_id: int, staff_id: int) -> StaffAttributeResponseSchema:
-        staff = self.db.query(Staff).filter(Staff.store_id == store_id, Staff.id == staff_id).first()
-        if not staff or not staff.staff_attributes:
-            raise HTTPException(status_code=404, detail="Staff or Staff attributes not found")
-
-        staff_attributes = staff.staff_attributes[0]
-        return StaffAttributeResponseSchema.from_orm(staff_attributes)
+        return result.scalars().one()
 
-    def update_my_account(self, store_id: int, data: dict) -> Staff:
-        logger.debug(f"Updating my account for store ID: {store_id} with data: {data}")
-        staff = self.db.query(Staff).filter(Staff.store_id == store_id).first()
+    async def update_my_account(self, store_id: int, data: dict) -> Staff:
+        result = await self.db.execute(select(Staff).where(Staff.store_id == store_id))
+        staff = result.scalars().first()
         if staff:
             for key, value in data.items():
                 setattr(staff, key, value)
-            self.db.commit()
-            self.db.refresh(staff)
-            logger.debug(f"My account updated: {staff}")
+            await self._bump_bookings_versions(store_id, staff.store_id)
+            await self.db.commit()
+            principal_cache.invalidate_staff(staff.id)
+            await self.db.refresh(staff)
         return staff
 
-    def get_staffs(self, store_id: int) -> List[StaffResponseSchema]:
-        logger.debug(f"Getting staffs for store ID: {store_id}")
-
-        # スタッフと関連するスタッフ属性をJOINして取得する
-        staffs = self.db.query(Staff).filter(Staff.store_id == store_id).all()
-
-        # スタッフ情報にstaff_attributesを付けてレスポンス
-        staff_responses = []
-        for staff in staffs:
-            if staff.staff_attributes:
-                staff_attributes = staff.staff_attributes[0]  # 最初のスタッフ属性を取得
-                staff_responses.append(StaffResponseSchema(
+    async def get_staffs(self, store_id: int, after_id: Optional[int] = None, limit: Optional[int] = None) -> List[StaffResponseSchema]:
+        stmt = select(Staff).options(selectinload(Staff.staff_attributes))\
+            .where(Staff.store_id == store_id, Staff.staff_attributes.any())
+        if after_id is not None:
+            stmt = stmt.where(Staff.id > after_id)
+        stmt = stmt.order_by(Staff.id)
+        if limit is not None:
+            stmt = stmt.limit(limit + 1)
+        result = await self.db.execute(stmt)
+        return [
+            StaffResponseSchema(
                 id=staff.id,
                 role_id=staff.role_id,
                 store_id=staff.store_id,
-                staff_attributes=[StaffAttributeResponseSchema.from_orm(staff_attributes)]
-            ))
-
-        logger.debug(f"Staffs found: {staff_responses}")
-        return staff_responses
-
-    def get_staff(self, store_id: int, staff_id: int) -> Staff:
-        logger.debug(f"Getting staff ID: {staff_id} for store ID: {store_id}")
-        staff = self.db.query(Staff).filter(Staff.store_id == store_id, Staff.id == staff_id).first()
-        logger.debug(f"Staff found: {staff}")
-        return staff
-
-    def update_staff(self, store_id: int, staff_id: int, data: dict) -> Staff:
-        logger.debug(f"Updating staff ID: {staff_id} for store ID: {store_id} with data: {data}")
-        staff = self.db.query(Staff).filter(Staff.store_id == store_id, Staff.id == staff_id).first()
+                staff_attributes=[StaffAttributeResponseSchema.from_orm(staff.staff_attributes[0])]
+            )
+            for staff in result.scalars().all()
+        ]
+
+    async def _get_staff(self, store_id: int, staff_id: int) -> Optional[Staff]:
+        result = await self.db.execute(select(Staff).where(Staff.store_id == store_id, Staff.id == staff_id))
+        return result.scalars().first()
+
+    async def get_staff(self, store_id: int, staff_id: int) -> Staff:
+        return await self._get_staff(store_id, staff_id)
+
+    async def _bump_bookings_versions(self, *store_ids: int):
+        # 予約のレスポンスには担当スタッフの情報が含まれるため、スタッフの変更でも予約の ETag を変える
+        store_service = AsyncStoreService(self.db)
+        for store_id in sorted(set(store_ids)):
+            await store_service.bump_change_version(store_id, "bookings")
+
+    async def update_staff(self, store_id: int, staff_id: int, data: dict) -> Staff:
+        staff = await self._get_staff(store_id, staff_id)
         if staff:
             for key, value in data.items():
                 setattr(staff, key, value)
-            self.db.commit()
-            self.db.refresh(staff)
-            logger.debug(f"Staff updated: {staff}")
+            # 店舗が変わった場合は、移動元と移動先の両方の予約が変わる
+            await self._bump_bookings_versions(store_id, staff.store_id)
+            await self.db.commit()
+            # ロールや店舗が変わった可能性があるため、キャッシュした Principal を破棄する
+            principal_cache.invalidate_staff(staff.id)
+            await self.db.refresh(staff)
         return staff
 
-    def delete_staff(self, store_id: int, staff_id: int) -> None:
-        logger.debug(f"Deleting staff ID: {staff_id} for store ID: {store_id}")
-        staff = self.db.query(Staff).filter(Staff.store_id == store_id, Staff.id == staff_id).first()
+    async def delete_staff(self, store_id: int, staff_id: int) -> None:
+        staff = await self._get_staff(store_id, staff_id)
         if staff:
-            self.db.delete(staff)
-            self.db.commit()
-            logger.debug(f"Staff deleted: {staff}")
-
-    def get_staff_id_from_token(self, token: str) -> int:
-        try:
-            payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
-            staff_id: int = payload.get("sub")
-            if staff_id is None:
-                raise HTTPException(status_code=401, detail="Invalid token")
-            return staff_id
-        except JWTError:
-            raise HTTPException(status_code=401, detail="Invalid token")
+            await self.db.delete(staff)
+            await self._bump_bookings_versions(store_id)
+            await self.db.commit()
+            principal_cache.invalidate_staff(staff_id)
 
 # FastAPIの依存関係として使用するための関数
-def get_staff_service(db: Session = Depends(get_db)) -> StaffService:
-    return StaffService(db=db)
\ No newline at end of file
+def get_async_staff_service(db: AsyncSession = Depends(get_async_db)) -> AsyncStaffService:
+    return AsyncStaffService(db=db)
\ No newline at end of file
@@ -0,0 +1,128 @@
+# backend/app/services/stats_service.py
+from collections import defaultdict
+from datetime import date
+from typing import Dict, Iterable, List, Optional, Tuple
+from sqlalchemy import case, delete, func, insert, select
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+from fastapi import Depends, HTTPException, status
+from app.db.database import get_db
+from app.models.daily_booking_stat import DailyBookingStat
+from app.models.event import Event
+from app.models.relation_of_event_and_staff import RelationOfEventAndStaff
+from app.schemas.stats import DailyBookingStatSchema
+
+# 担当スタッフが割り当てられていない予約の staff_id
+UNASSIGNED_STAFF_ID = 0
+
+# (店舗ID, 日付, スタッフID) -> [予約数, 予約時間(分), キャンセル数]
+StatDeltas = Dict[Tuple[int, date, int], List[int]]
+
+
+def booking_contribution(store_id: int, from_at, duration_by_minutes: Optional[int], event_status: str,
+                         staff_ids: Iterable[int], sign: int = 1, deltas: Optional[StatDeltas] = None) -> StatDeltas:
+    """
+    1件の予約が日次集計に与える寄与を deltas に加算して返します。
+    取り消す場合（更新前の状態や削除）は sign=-1 を指定します。
+    """
+    deltas = deltas if deltas is not None else defaultdict(lambda: [0, 0, 0])
+    day = from_at.date()
+    for staff_id in (list(staff_ids) or [UNASSIGNED_STAFF_ID]):
+        counts = deltas[(store_id, day, staff_id)]
+        if event_status == 'canceled':
+            counts[2] += sign
+        else:
+            counts[0] += sign
+            counts[1] += sign * (duration_by_minutes or 0)
+    return deltas
+
+
+class StatsService:
+    """
+    店舗の日次予約集計（daily_booking_stats）を扱います。
+    EventService が予約の作成・更新・削除と同じトランザクション内で apply() を呼び、差分を加算していきます。
+    """
+    def __init__(self, db: Session):
+        self.db = db
+
+    def _upsert(self):
+        # 同じ (店舗, 日付, スタッフ) の行があれば加算する。MySQL 以外（ローカルのSQLite等）は ON CONFLICT を使う
+        dialect = self.db.get_bind().dialect.name
+        if dialect == 'mysql':
+            stmt = mysql_insert(DailyBookingStat)
+            return stmt.on_duplicate_key_update(
+                booking_count=DailyBookingStat.booking_count + stmt.inserted.booking_count,
+                booked_minutes=DailyBookingStat.booked_minutes + stmt.inserted.booked_minutes,
+                canceled_count=DailyBookingStat.canceled_count + stmt.inserted.canceled_count,
+            )
+        stmt = sqlite_insert(DailyBookingStat)
+        return stmt.on_conflict_do_update(
+            index_elements=['store_id', 'date', 'staff_id'],
+            set_=dict(
+                booking_count=DailyBookingStat.booking_count + stmt.excluded.booking_count,
+                booked_minutes=DailyBookingStat.booked_minutes + stmt.excluded.booked_minutes,
+                canceled_count=DailyBookingStat.canceled_count + stmt.excluded.canceled_count,
+            ),
+        )
+
+    def apply(self, deltas: StatDeltas):
+        """
+        差分を集計テーブルに加算します。コミットは呼び出し側で行います。
+        """
+        rows = [
+            {"store_id": store_id, "date": day, "staff_id": staff_id,
+             "booking_count": counts[0], "booked_minutes": counts[1], "canceled_count": counts[2]}
+            for (store_id, day, staff_id), counts in deltas.items()
+            if any(counts)
+        ]
+        if rows:
+            self.db.execute(self._upsert(), rows)
+
+    def get_daily_stats(self, store_id: int, from_date: date, to_date: date) -> List[DailyBookingStatSchema]:
+        # (store_id, date, staff_id) のインデックスで [from_date, to_date] を範囲検索する
+        if from_date > to_date:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="'from' must not be later than 'to'")
+        stats = self.db.query(DailyBookingStat)\
+            .filter(DailyBookingStat.store_id == store_id,
+                    DailyBookingStat.date >= from_date,
+                    DailyBookingStat.date <= to_date)\
+            .order_by(DailyBookingStat.date, DailyBookingStat.staff_id)\
+            .all()
+        return [DailyBookingStatSchema.from_orm(stat) for stat in stats]
+
+    def backfill(self, store_id: Optional[int] = None) -> int:
+        """
+        events から日次集計を作り直します。store_id を省略すると全店舗が対象です。
+        """
+        day = func.date(Event.from_at)
+        staff_id = func.coalesce(RelationOfEventAndStaff.staff_id, UNASSIGNED_STAFF_ID)
+        is_active = Event.status == 'active'
+        aggregated = select(
+            Event.store_id,
+            day,
+            staff_id,
+            func.sum(case((is_active, 1), else_=0)),
+            func.sum(case((is_active, func.coalesce(Event.duration_by_minutes, 0)), else_=0)),
+            func.sum(case((is_active, 0), else_=1)),
+        ).select_from(Event)\
+            .outerjoin(RelationOfEventAndStaff, RelationOfEventAndStaff.event_id == Event.id)\
+            .group_by(Event.store_id, day, staff_id)
+
+        clear = delete(DailyBookingStat)
+        if store_id is not None:
+            aggregated = aggregated.where(Event.store_id == store_id)
+            clear = clear.where(DailyBookingStat.store_id == store_id)
+
+        self.db.execute(clear)
+        result = self.db.execute(
+            insert(DailyBookingStat).from_select(
+                ['store_id', 'date', 'staff_id', 'booking_count', 'booked_minutes', 'canceled_count'],
+                aggregated,
+            )
+        )
+        self.db.commit()
+        return result.rowcount
+
+def get_stats_service(db: Session = Depends(get_db)) -> StatsService:
+    return StatsService(db)
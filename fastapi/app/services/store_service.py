@@ -1,49 +1,93 @@
+from typing import Optional, Tuple
+from datetime import datetime
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from fastapi import HTTPException, status, Depends
 
 from app.models.store import Store
 from app.schemas.store import StoreCreateSchema, StoreUpdateSchema
-from app.db.database import get_db
+from app.db.database import get_async_db
+
+# 変更バージョンを管理しているリソースと、stores テーブルの列の対応
+CHANGE_VERSION_COLUMNS = {
+    "bookings": Store.bookings_version,
+    "customers": Store.customers_version,
+}
 
 class StoreService:
+    """
+    同期のセッションから店舗の変更バージョンを更新します。同期の EventService（スレッドプールで動く予約の書き込み）専用で、
+    それ以外の店舗の操作は AsyncStoreService を使います。
+    """
     def __init__(self, db: Session):
         self.db = db
 
-    def get_stores(self):
-        stores = self.db.query(Store).all()
-        return stores
+    def bump_change_version(self, store_id: int, resource: str):
+        """
+        店舗のリソースが変更されたことを記録します。コミットは呼び出し側で行います。
+        """
+        column = CHANGE_VERSION_COLUMNS[resource]
+        self.db.query(Store).filter(Store.id == store_id)\
+            .update({column: column + 1}, synchronize_session=False)
+
+class AsyncStoreService:
+    """
+    店舗を扱うサービスです。AsyncSession を使い、DBの待ち時間中もイベントループを塞ぎません。
+    """
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def get_stores(self):
+        result = await self.db.execute(select(Store))
+        return result.scalars().all()
 
-    def create_store(self, store_data: StoreCreateSchema):
+    async def create_store(self, store_data: StoreCreateSchema):
         new_store = Store(**store_data.dict())
         self.db.add(new_store)
-        self.db.commit()
-        self.db.refresh(new_store)
+        await self.db.commit()
+        await self.db.refresh(new_store)
         return new_store
 
-    def get_store(self, store_id: int):
-        store = self.db.query(Store).filter(Store.id == store_id).first()
+    async def get_store(self, store_id: int):
+        store = await self.db.get(Store, store_id)
         if store is None:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Store not found")
         return store
 
-    def get_store_settings(self, store_id: int):
-        store = self.get_store(store_id)
-        return store  # Storeモデルの設定情報をそのまま返す
+    async def get_store_settings(self, store_id: int):
+        return await self.get_store(store_id)
 
-    def update_store_settings(self, store_id: int, store_data: StoreUpdateSchema):
-        store = self.get_store(store_id)
+    async def update_store_settings(self, store_id: int, store_data: StoreUpdateSchema):
+        store = await self.get_store(store_id)
         for key, value in store_data.dict(exclude_unset=True).items():
             setattr(store, key, value)
-        self.db.commit()
-        self.db.refresh(store)
+        await self.db.commit()
+        await self.db.refresh(store)
         return store
 
-    def delete_store(self, store_id: int):
-        store = self.get_store(store_id)
-        self.db.delete(store)
-        self.db.commit()
+    async def get_change_version(self, store_id: int, resource: str) -> Optional[Tuple[int, datetime]]:
+        """
+        店舗のリソース（bookings / customers）の変更バージョンと最終更新日時を主キー検索1回で返します。
+        """
+        result = await self.db.execute(
+            select(CHANGE_VERSION_COLUMNS[resource], Store.updated_at).where(Store.id == store_id)
+        )
+        row = result.first()
+        return tuple(row) if row else None
+
+    async def bump_change_version(self, store_id: int, resource: str):
+        column = CHANGE_VERSION_COLUMNS[resource]
+        await self.db.execute(
+            update(Store).where(Store.id == store_id).values({column: column + 1}).execution_options(synchronize_session=False)
+        )
+
+    async def delete_store(self, store_id: int):
+        store = await self.get_store(store_id)
+        await self.db.delete(store)
+        await self.db.commit()
         return {"detail": "Store deleted successfully"}
 
 # FastAPI の依存関係として使用するための関数
-def get_store_service(db: Session = Depends(get_db)) -> StoreService:
-    return StoreService(db=db)
\ No newline at end of file
+def get_async_store_service(db: AsyncSession = Depends(get_async_db)) -> AsyncStoreService:
+    return AsyncStoreService(db=db)
\ No newline at end of file
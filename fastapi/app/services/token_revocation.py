@@ -0,0 +1,177 @@
+# backend/app/services/token_revocation.py
+import asyncio
+import hashlib
+import logging
+import math
+import threading
+from datetime import datetime, timezone
+from typing import Dict, Iterable, Optional, Tuple
+from sqlalchemy import delete
+from sqlalchemy.exc import IntegrityError
+from starlette.concurrency import run_in_threadpool
+from app.core.config import settings
+from app.db.database import SessionLocal
+from app.models.access_token import AccessToken
+
+logger = logging.getLogger(__name__)
+
+
+def revocation_id(token: str, payload: dict) -> str:
+    """
+    失効リストで使うトークンの識別子を返します。jti クレームがなければトークンのダイジェストを使います。
+    """
+    return payload.get("jti") or hashlib.sha256(token.encode()).hexdigest()
+
+
+def _utc(value: datetime) -> datetime:
+    # MySQL から読んだ日時はタイムゾーンを持たないため、UTCとして扱う
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+class BloomFilter:
+    """
+    偽陽性のみを許す確率的な集合です。含まれていない要素は確実に「含まれていない」と判定できます。
+    """
+    def __init__(self, capacity: int, error_rate: float):
+        self.capacity = capacity
+        self.size = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self._bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, item: str):
+        # 2つのハッシュ値から k 個の位置を作る（Kirsch–Mitzenmacher 法）
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hash_count))
+
+    def add(self, item: str):
+        for position in self._positions(item):
+            self._bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, item: str) -> bool:
+        return all(self._bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+
+class TokenRevocationList:
+    """
+    ログアウトで失効させたトークンを access_tokens テーブルに記録し、各ワーカーのメモリにも保持します。
+
+    判定はブルームフィルタで行い、含まれる可能性がある場合のみ正確な集合で確認するため、
+    「失効していない」大多数のリクエストでは DB への問い合わせが発生しません。
+    他のワーカーで失効したトークンは、sync() で定期的に取り込みます。
+    """
+    def __init__(self, capacity: int, error_rate: float, sync_overlap_ids: int = 1000):
+        self.error_rate = error_rate
+        self.sync_overlap_ids = sync_overlap_ids
+        self._lock = threading.Lock()
+        self._bloom = BloomFilter(capacity, error_rate)
+        # 失効したトークンの識別子 -> 有効期限
+        self._revoked: Dict[str, datetime] = {}
+        # 取り込み済みの access_tokens の最大ID
+        self._last_id = 0
+
+    def is_revoked(self, token_id: str) -> bool:
+        if token_id not in self._bloom:
+            return False
+        return token_id in self._revoked
+
+    def _add(self, token_id: str, expired_at: datetime):
+        # 呼び出し側で self._lock を取得していること
+        if token_id in self._revoked:
+            return
+        self._revoked[token_id] = _utc(expired_at)
+        if len(self._revoked) > self._bloom.capacity:
+            self._rebuild(self._bloom.capacity * 2)
+        else:
+            self._bloom.add(token_id)
+
+    def _rebuild(self, capacity: int):
+        # ブルームフィルタからは削除できないため、正確な集合から作り直す
+        bloom = BloomFilter(capacity, self.error_rate)
+        for token_id in self._revoked:
+            bloom.add(token_id)
+        self._bloom = bloom
+
+    def revoke(self, db, token_id: str, subject: str, expired_at: datetime):
+        """
+        トークンを失効させます。失効は access_tokens に記録してコミットします。
+        """
+        if self.is_revoked(token_id):
+            return
+        row = AccessToken(access_token=token_id, staff_secrets=subject, expired_at=expired_at)
+        db.add(row)
+        try:
+            db.commit()
+        except IntegrityError:
+            # 同じトークンのログアウトが同時に行われ、別のリクエストが先に記録した
+            db.rollback()
+        with self._lock:
+            self._add(token_id, expired_at)
+
+    def _apply(self, rows: Iterable[Tuple[int, str, datetime]]):
+        with self._lock:
+            for row_id, token_id, expired_at in rows:
+                self._add(token_id, expired_at)
+                self._last_id = max(self._last_id, row_id)
+
+    def sync(self):
+        """
+        他のワーカーで追加された失効を取り込みます。
+
+        AUTO_INCREMENT のIDは INSERT の時点で採番され、コミットの順序とは一致しないため、
+        取り込み済みの最大IDより小さいIDの行が後から見えるようになることがあります。
+        取りこぼさないよう、直近 sync_overlap_ids 件分のIDは毎回読み直します（取り込み済みのものは無視されます）。
+        """
+        db = SessionLocal()
+        try:
+            rows = db.query(AccessToken.id, AccessToken.access_token, AccessToken.expired_at)\
+                .filter(AccessToken.id > self._last_id - self.sync_overlap_ids, AccessToken.expired_at > datetime.utcnow())\
+                .order_by(AccessToken.id)\
+                .all()
+        finally:
+            db.close()
+        self._apply(rows)
+
+    def sweep(self, now: Optional[datetime] = None) -> int:
+        """
+        有効期限が過ぎた失効を、テーブルとメモリの両方から取り除きます。
+        """
+        now = now or datetime.now(timezone.utc)
+        db = SessionLocal()
+        try:
+            result = db.execute(delete(AccessToken).where(AccessToken.expired_at <= now.replace(tzinfo=None)))
+            db.commit()
+        finally:
+            db.close()
+        with self._lock:
+            expired = [token_id for token_id, expired_at in self._revoked.items() if expired_at <= now]
+            for token_id in expired:
+                del self._revoked[token_id]
+            if expired:
+                self._rebuild(self._bloom.capacity)
+        return result.rowcount
+
+    async def run(self):
+        """
+        失効の取り込みと期限切れの掃除を定期的に行います。アプリケーションの起動時にタスクとして開始します。
+        """
+        sweep_every = max(1, settings.TOKEN_REVOCATION_SWEEP_SECONDS // settings.TOKEN_REVOCATION_SYNC_SECONDS)
+        ticks = 0
+        while True:
+            try:
+                if ticks % sweep_every == 0:
+                    await run_in_threadpool(self.sweep)
+                await run_in_threadpool(self.sync)
+            except Exception as e:
+                logger.error(f"Error while syncing revoked tokens: {str(e)}")
+            ticks += 1
+            await asyncio.sleep(settings.TOKEN_REVOCATION_SYNC_SECONDS)
+
+
+# プロセス全体で共有する失効リスト
+revoked_tokens = TokenRevocationList(
+    capacity=settings.TOKEN_REVOCATION_BLOOM_CAPACITY,
+    error_rate=settings.TOKEN_REVOCATION_BLOOM_ERROR_RATE,
+    sync_overlap_ids=settings.TOKEN_REVOCATION_SYNC_OVERLAP_IDS,
+)
@@ -0,0 +1,16 @@
+# tests/conftest.py
+import os
+
+# app.db.database はインポート時に設定からエンジンを作るため、MySQL のドライバや接続先が無くても読み込めるようにする。
+# テストでは各テストで作るインメモリの SQLite を使い、このURLには接続しない
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+os.environ.setdefault("SECRET_KEY", "test")
+
+from sqlalchemy import BigInteger  # noqa: E402
+from sqlalchemy.ext.compiler import compiles  # noqa: E402
+
+
+@compiles(BigInteger, "sqlite")
+def _compile_big_integer_for_sqlite(type_, compiler, **kw):
+    # SQLite の自動採番は INTEGER PRIMARY KEY のときだけ有効になる
+    return "INTEGER"
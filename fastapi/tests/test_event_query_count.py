@@ -0,0 +1,116 @@
+# tests/test_event_query_count.py
+# 予約一覧の取得で発行されるSQLの件数が、予約の件数によらず一定であること（N+1 になっていないこと）を確認する
+import asyncio
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import List
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from app.db.database import Base
+from app.models import Customer, Event, Role, Staff, StaffAttribute, Store
+from app.schemas.event import EventResponseSchema
+from app.services.event_service import AsyncEventService, EventService
+
+SMALL = 1
+LARGE = 35
+
+
+def seed(db, event_count: int) -> int:
+    store = Store(
+        name="store", name_ruby="すとあ", postal_code="1000001", prefecture="東京都",
+        street="千代田", address="1-1", building="", phone_number="0300000000",
+    )
+    db.add(store)
+    db.flush()
+    role = Role(store_id=store.id, name="admin")
+    customer = Customer(store_id=store.id)
+    db.add_all([role, customer])
+    db.flush()
+    staffs = []
+    for i in range(3):
+        staff = Staff(store_id=store.id, role_id=role.id)
+        staff.staff_attributes.append(StaffAttribute(
+            name=f"staff{i}", name_ruby="すたっふ", mail_address=f"staff{store.id}-{i}@example.com", hashed_password="x",
+        ))
+        staffs.append(staff)
+    db.add_all(staffs)
+    start = datetime(2026, 10, 1, 9)
+    for i in range(event_count):
+        db.add(Event(
+            store_id=store.id, customer_id=customer.id, duration_by_minutes=60,
+            from_at=start + timedelta(hours=i), to_at=start + timedelta(hours=i + 1),
+            title="カット", details={"overview": "初回"}, status="active", staffs=[staffs[i % 3], staffs[(i + 1) % 3]],
+        ))
+    db.commit()
+    return store.id
+
+
+@contextmanager
+def count_statements(engine, statements: List[str]):
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+
+@pytest.fixture
+def engine():
+    engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+    Base.metadata.create_all(engine)
+    yield engine
+    engine.dispose()
+
+
+def test_get_events_statement_count_does_not_depend_on_row_count(engine):
+    Session = sessionmaker(bind=engine, autoflush=False)
+    with Session() as db:
+        small_store = seed(db, SMALL)
+        large_store = seed(db, LARGE)
+
+    counts = {}
+    for store_id, expected in [(small_store, SMALL), (large_store, LARGE)]:
+        statements: List[str] = []
+        with Session() as db, count_statements(engine, statements):
+            events = EventService(db).get_events(store_id)
+            # レスポンスの組み立てで遅延読み込みが起きないことも確認する
+            body = [EventResponseSchema.from_orm(e) for e in events]
+        assert len(body) == expected
+        assert all(len(item.staffs) == 2 for item in body)
+        counts[expected] = len(statements)
+
+    assert counts[SMALL] == counts[LARGE]
+
+
+def test_async_get_events_statement_count_does_not_depend_on_row_count():
+    async_engine = create_async_engine("sqlite+aiosqlite://", poolclass=StaticPool)
+    AsyncSessionLocal = sessionmaker(async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
+    async def run():
+        async with async_engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        async with AsyncSessionLocal() as db:
+            small_store = await db.run_sync(seed, SMALL)
+            large_store = await db.run_sync(seed, LARGE)
+
+        counts = {}
+        for store_id, expected in [(small_store, SMALL), (large_store, LARGE)]:
+            statements: List[str] = []
+            async with AsyncSessionLocal() as db:
+                with count_statements(async_engine.sync_engine, statements):
+                    events = await AsyncEventService(db).get_events(store_id)
+                    body = [EventResponseSchema.from_orm(e) for e in events]
+            assert len(body) == expected
+            assert all(len(item.staffs) == 2 for item in body)
+            counts[expected] = len(statements)
+        await async_engine.dispose()
+        return counts
+
+    counts = asyncio.run(run())
+    assert counts[SMALL] == counts[LARGE]
@@ -0,0 +1,119 @@
+# tests/test_event_write_locking.py
+# 予約の変更・削除で、スタッフの行ロックを取る前にロックなしの読み取りを行っていないこと、
+# 他のワーカーが直前にコミットした予約と重複する変更を受け付けないことを確認する
+from datetime import datetime
+from typing import List
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import create_engine, event
+from sqlalchemy.dialects import mysql
+from sqlalchemy.orm import sessionmaker
+from app.db.database import Base
+from app.models import Customer, Role, Staff, StaffAttribute, Store
+from app.schemas.event import EventCreateSchema, EventUpdateSchema
+from app.services import event_service
+from app.services.event_service import EventService
+from app.services.schedule_index import StaffScheduleIndex
+
+
+@pytest.fixture
+def Session(tmp_path, monkeypatch):
+    # 2つのセッションを別々の接続で使うため、ファイルの SQLite を使う
+    engine = create_engine(f"sqlite:///{tmp_path / 'events.db'}")
+    Base.metadata.create_all(engine)
+    # テストごとに空のインデックスを使う（このワーカーのインデックス）
+    monkeypatch.setattr(event_service, "schedule_index", StaffScheduleIndex(stripes=8, max_buckets=100))
+    yield sessionmaker(bind=engine, autoflush=False)
+    engine.dispose()
+
+
+def seed(db):
+    store = Store(
+        name="store", name_ruby="すとあ", postal_code="1000001", prefecture="東京都",
+        street="千代田", address="1-1", building="", phone_number="0300000000",
+    )
+    db.add(store)
+    db.flush()
+    role = Role(store_id=store.id, name="admin")
+    customer = Customer(store_id=store.id)
+    db.add_all([role, customer])
+    db.flush()
+    staff = Staff(store_id=store.id, role_id=role.id)
+    staff.staff_attributes.append(StaffAttribute(
+        name="staff", name_ruby="すたっふ", mail_address="staff@example.com", hashed_password="x",
+    ))
+    db.add(staff)
+    db.commit()
+    return store.id, customer.id, staff.id
+
+
+def booking(customer_id: int, staff_id: int, from_hour: int, to_hour: int, minute: int = 0) -> EventCreateSchema:
+    return EventCreateSchema(
+        customer_id=customer_id, staff_ids=[staff_id], status="active", title="カット",
+        from_at=datetime(2026, 10, 1, from_hour, minute), to_at=datetime(2026, 10, 1, to_hour, minute),
+        details={"overview": "初回"},
+    )
+
+
+def record_selects(engine, statements: List[str]):
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        # SQLite は FOR UPDATE を出力しないため、MySQL の方言でコンパイルし直して判定する
+        compiled = getattr(context, "compiled", None)
+        if compiled is not None and statement.lstrip().upper().startswith("SELECT"):
+            statements.append(str(compiled.statement.compile(dialect=mysql.dialect())))
+
+    return before_cursor_execute
+
+
+@pytest.mark.parametrize("operation", ["update", "delete"])
+def test_no_consistent_read_before_staff_lock(Session, operation):
+    with Session() as db:
+        store_id, customer_id, staff_id = seed(db)
+        event_id = EventService(db).create_event(store_id, booking(customer_id, staff_id, 9, 10)).id
+
+    statements: List[str] = []
+    with Session() as db:
+        listener = record_selects(db.get_bind(), statements)
+        try:
+            service = EventService(db)
+            if operation == "update":
+                service.update_event(store_id, event_id, EventUpdateSchema(title="カラー"))
+            else:
+                service.delete_event(store_id, event_id)
+        finally:
+            event.remove(db.get_bind(), "before_cursor_execute", listener)
+
+    staff_lock = next(i for i, s in enumerate(statements) if "FROM staffs" in s and "FOR UPDATE" in s)
+    consistent = [i for i, s in enumerate(statements) if "FOR UPDATE" not in s and "LOCK IN SHARE MODE" not in s]
+    assert consistent and min(consistent) > staff_lock
+
+
+def test_update_sees_booking_committed_by_another_worker(Session, monkeypatch):
+    with Session() as db:
+        store_id, customer_id, staff_id = seed(db)
+        # このワーカーのインデックスに 9:00-10:00 のバケットを読み込ませておく
+        event_id = EventService(db).create_event(store_id, booking(customer_id, staff_id, 9, 10)).id
+
+    worker_index = event_service.schedule_index
+    other_index = StaffScheduleIndex(stripes=8, max_buckets=100)
+    lock_event = EventService._lock_event
+
+    def lock_event_then_interleave(self, *args):
+        result = lock_event(self, *args)
+        # 予約の行を読んだ直後に、別のワーカー（別のインデックス）が 10:30-11:30 の予約をコミットする
+        monkeypatch.setattr(event_service, "schedule_index", other_index)
+        try:
+            with Session() as other:
+                EventService(other).create_event(store_id, booking(customer_id, staff_id, 10, 11, minute=30))
+        finally:
+            monkeypatch.setattr(event_service, "schedule_index", worker_index)
+        return result
+
+    monkeypatch.setattr(EventService, "_lock_event", lock_event_then_interleave)
+    with Session() as db:
+        with pytest.raises(HTTPException) as raised:
+            EventService(db).update_event(store_id, event_id, EventUpdateSchema(
+                from_at=datetime(2026, 10, 1, 10), to_at=datetime(2026, 10, 1, 11),
+            ))
+    assert raised.value.status_code == 409
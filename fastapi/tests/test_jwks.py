@@ -0,0 +1,132 @@
+# tests/test_jwks.py
+# 公開鍵の取得が同時に1回にまとまること、未知の kid と取得失敗による再取得が
+# min_refresh_interval 秒に1回までに制限されることを確認する
+import asyncio
+from types import SimpleNamespace
+from typing import List
+import httpx
+import pytest
+from app.core import jwks
+from app.core.jwks import KeyFetchError, SupabaseKeyProvider
+
+MIN_REFRESH_INTERVAL = 30
+TTL = 3600
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    # asyncio のイベントループは time.monotonic を使うため、jwks モジュールの time だけを差し替える
+    clock = Clock()
+    monkeypatch.setattr(jwks, "time", SimpleNamespace(monotonic=clock))
+    return clock
+
+
+def keys_body(*kids: str) -> dict:
+    return {"keys": [{"kid": kid, "publicKey": f"key-{kid}"} for kid in kids]}
+
+
+def provider(responses: List[httpx.Response], requests: List[httpx.Request], delay: float = 0) -> SupabaseKeyProvider:
+    # 用意した応答を順に返し、最後の応答はその後も返し続ける
+    async def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        if delay:
+            await asyncio.sleep(delay)
+        return responses.pop(0) if len(responses) > 1 else responses[0]
+
+    return SupabaseKeyProvider(
+        "https://example.supabase.co", "anon", ttl=TTL, min_refresh_interval=MIN_REFRESH_INTERVAL,
+        transport=httpx.MockTransport(handler),
+    )
+
+
+def run(provider: SupabaseKeyProvider, coroutine):
+    async def main():
+        try:
+            return await coroutine
+        finally:
+            await provider.aclose()
+
+    return asyncio.run(main())
+
+
+def test_concurrent_requests_share_one_fetch(clock):
+    requests: List[httpx.Request] = []
+    keys = provider([httpx.Response(200, json=keys_body("k1"))], requests, delay=0.05)
+
+    async def scenario():
+        return await asyncio.gather(*(keys.get_key("k1") for _ in range(20)))
+
+    results = run(keys, scenario())
+
+    assert results == ["key-k1"] * 20
+    assert len(requests) == 1
+
+
+def test_unknown_kid_refetches_at_most_once_per_interval(clock):
+    requests: List[httpx.Request] = []
+    keys = provider([httpx.Response(200, json=keys_body("k1")), httpx.Response(200, json=keys_body("k1", "k2"))], requests)
+
+    async def scenario():
+        assert await keys.get_key("k1") == "key-k1"
+        # 取得した直後は、未知の kid が続いても取得し直さない
+        for _ in range(5):
+            clock.now += 1
+            assert await keys.get_key("unknown") is None
+        assert len(requests) == 1
+        # 間隔が空けば1回だけ取得し直し、追加された鍵を使えるようになる
+        clock.now += MIN_REFRESH_INTERVAL
+        assert await keys.get_key("k2") == "key-k2"
+        assert await keys.get_key("unknown") is None
+        assert len(requests) == 2
+
+    run(keys, scenario())
+
+
+@pytest.mark.parametrize("failure", [
+    httpx.Response(503, text="unavailable"),
+    httpx.Response(200, json={"unexpected": []}),
+    httpx.Response(200, text="not json"),
+], ids=["5xx", "missing-keys", "malformed-json"])
+def test_failed_refresh_backs_off_and_keeps_stale_key(clock, failure):
+    requests: List[httpx.Request] = []
+    keys = provider([httpx.Response(200, json=keys_body("k1")), failure], requests)
+
+    async def scenario():
+        assert await keys.get_key("k1") == "key-k1"
+        # 鍵の期限が切れた後に取得に失敗しても、期限切れの鍵で検証を続ける
+        clock.now += TTL + 1
+        assert await keys.get_key("k1") == "key-k1"
+        assert len(requests) == 2
+        # 失敗の直後は、期限切れでも未知の kid でも取得し直さない
+        for _ in range(5):
+            clock.now += 1
+            assert await keys.get_key("k1") == "key-k1"
+            assert await keys.get_key("unknown") is None
+        assert len(requests) == 2
+        clock.now += MIN_REFRESH_INTERVAL
+        assert await keys.get_key("k1") == "key-k1"
+        assert len(requests) == 3
+
+    run(keys, scenario())
+
+
+def test_first_fetch_failure_raises_then_backs_off(clock):
+    requests: List[httpx.Request] = []
+    keys = provider([httpx.Response(500)], requests)
+
+    async def scenario():
+        with pytest.raises(KeyFetchError):
+            await keys.get_key("k1")
+        clock.now += 1
+        assert await keys.get_key("k1") is None
+        assert len(requests) == 1
+
+    run(keys, scenario())